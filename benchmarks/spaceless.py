@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+Compares `{% specialspaceless %}` with the two regex passes it used to do, on 1 MB of
+form html split in node outputs of about 10 KB. Peak memory is measured in Python 3::
+
+    python benchmarks/spaceless.py
+
+The single regex pass is a bit faster than the two passes on a whole string. Rendering
+`{% specialspaceless %}` takes about as long as joining the node outputs and doing the
+two passes, what streaming the outputs saves is memory: the joined output and the copy
+made by the first pass are never allocated, so the peak is about a third lower::
+
+    two passes, 1 MB string              6.04 ms     2.71 MB peak
+    one pass, 1 MB string                5.17 ms     2.84 MB peak
+    two passes, joined node outputs      8.27 ms     3.71 MB peak
+    specialspaceless, node outputs       8.32 ms     2.54 MB peak
+"""
+from __future__ import print_function, unicode_literals
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import django
+from django.conf import settings
+
+settings.configure(
+    INSTALLED_APPS=['crispy_forms'],
+    TEMPLATES=[{'BACKEND': 'django.template.backends.django.DjangoTemplates', 'APP_DIRS': True}],
+)
+django.setup()
+
+from django.template import Context, Template
+from django.utils.encoding import force_text
+
+from crispy_forms.templatetags.crispy_forms_utils import remove_text_spaces
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+FIELD = '''
+    <div id="div_id_email_%d" class="form-group">
+            <label for="id_email_%d" class="control-label  requiredField">
+                email<span class="asteriskField">*</span>
+            </label>
+
+        <div class="controls ">
+            <input class="emailinput form-control" id="id_email_%d" maxlength="30" name="email" type="email" />
+            <input type="hidden" name="initial-email" id="initial-id_email_%d" /><br/>
+            <p id="hint_id_email_%d" class="help-block">Insert your email</p>
+        </div>
+    </div>
+'''
+SIZE = 1024 * 1024
+CHUNK = 10 * 1024
+
+
+def two_passes(value):
+    # `remove_spaces` before it was a single pass
+    html = re.sub(r'>\s{3,}<', '> <', force_text(value))
+    return re.sub(r'/><', r'/> <', force_text(html))
+
+
+def node_outputs():
+    html = []
+    size = i = 0
+    while size < SIZE:
+        html.append(FIELD % ((i,) * 5))
+        size += len(html[-1])
+        i += 1
+    html = ''.join(html)[:SIZE]
+    return [html[start:start + CHUNK] for start in range(0, SIZE, CHUNK)]
+
+
+def peak_memory(function):
+    # Peak of memory allocated while calling `function`, in MB
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / SIZE
+
+
+def main(number=10):
+    outputs = node_outputs()
+    html = ''.join(outputs)
+    # Every output is a node of its own
+    nodes = ''.join('{{ output%d|safe }}' % i for i in range(len(outputs)))
+    template = Template(
+        '{% load crispy_forms_utils %}{% specialspaceless %}' + nodes + '{% endspecialspaceless %}'
+    )
+    plain = Template(nodes)
+    context = Context(dict(('output%d' % i, output) for i, output in enumerate(outputs)))
+
+    assert remove_text_spaces(html) == two_passes(html)
+    assert template.render(context) == two_passes(plain.render(context).strip())
+
+    timings = [
+        ('two passes, 1 MB string', lambda: two_passes(html)),
+        ('one pass, 1 MB string', lambda: remove_text_spaces(html)),
+        ('two passes, joined node outputs', lambda: two_passes(plain.render(context).strip())),
+        ('specialspaceless, node outputs', lambda: template.render(context)),
+    ]
+    for name, function in timings:
+        seconds = min(timeit.repeat(function, number=number, repeat=3)) / number
+        line = '%-32s %8.2f ms' % (name, seconds * 1000)
+        if tracemalloc is not None:
+            line += ' %8.2f MB peak' % peak_memory(function)
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
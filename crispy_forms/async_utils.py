@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+Rendering for asyncio based code, like async views. This module requires Python 3.5.
+"""
+import asyncio
+
+from django.template import Context
+from django.utils.safestring import mark_safe
+
+from crispy_forms.templatetags.crispy_forms_tags import CrispyFormNode
+from crispy_forms.utils import carry_request_state
+
+
+async def arender_crispy_form(form, helper=None, context=None, executor=None):
+    """
+    Coroutine version of `render_crispy_form`, it returns the same HTML output::
+
+        html = await arender_crispy_form(formset, helper)
+
+    Loading and rendering templates is blocking, so it happens in `executor`, by default
+    the event loop's one, instead of in the event loop, with the calling thread's language,
+    URLconf and script prefix. The layouts of a formset's forms are rendered concurrently.
+    """
+    loop = asyncio.get_event_loop()
+
+    if helper is not None:
+        node = CrispyFormNode('form', 'helper')
+    else:
+        node = CrispyFormNode('form', None)
+
+    node_context = Context(context)
+    node_context.update({
+        'form': form,
+        'helper': helper
+    })
+
+    parts, layouts, helper, template_pack = await loop.run_in_executor(
+        executor, carry_request_state(node.render_placeholders), node_context
+    )
+    render_layout = carry_request_state(helper.render_layout)
+    rendered_layouts = await asyncio.gather(*[
+        loop.run_in_executor(executor, render_layout, form, form_context, template_pack)
+        for form, form_context in layouts
+    ])
+
+    return mark_safe(''.join(node.splice_layouts(parts, [[html] for html in rendered_layouts])))
@@ -1,13 +1,12 @@
 from __future__ import unicode_literals
 from random import randint
 
-from django.template import Template
-from django.template.loader import render_to_string
 from django.template.defaultfilters import slugify
 
-from .compatibility import text_type
+from .compatibility import string_types, text_type
 from .layout import LayoutObject, Field, Div
-from .utils import render_field, flatatt, TEMPLATE_PACK
+from .template_cache import get_template, render_template, render_to_string, template_from_string, TemplateText
+from .utils import render_field, flatatt, RenderState, TEMPLATE_PACK
 
 
 class PrependedAppendedText(Field):
@@ -84,14 +83,12 @@ class FormActions(LayoutObject):
 
     def render(self, form, form_style, context, template_pack=TEMPLATE_PACK, **kwargs):
         html = self.get_rendered_fields(form, form_style, context, template_pack, **kwargs)
-        template = self.get_template_name(template_pack)
-        context.update({
+        template = get_template(self.get_template_name(template_pack))
+        return render_template(template, context, {
             'formactions': self,
             'fields_output': html
         })
 
-        return render_to_string(template, context.flatten())
-
     def flat_attrs(self):
         return flatatt(self.attrs)
 
@@ -136,8 +133,7 @@ class FieldWithButtons(Div):
         buttons = ''.join(
             render_field(
                 field, form, form_style, context,
-                field_template, layout_object=self,
-                template_pack=template_pack, **kwargs
+                field_template, template_pack=template_pack, **kwargs
             ) for field in self.fields[1:]
         )
 
@@ -167,6 +163,7 @@ class StrictButton(object):
     """
     template = '%s/layout/button.html'
     field_classes = 'btn'
+    content = TemplateText('content')
 
     def __init__(self, content, **kwargs):
         self.content = content
@@ -184,11 +181,11 @@ class StrictButton(object):
         self.flat_attrs = flatatt(kwargs)
 
     def render(self, form, form_style, context, template_pack=TEMPLATE_PACK, **kwargs):
-        self.content = Template(text_type(self.content)).render(context)
-        template = self.template % template_pack
-        context.update({'button': self})
-
-        return render_to_string(template, context.flatten())
+        button = self
+        if self.static_content is None:
+            button = RenderState(self, content=template_from_string(text_type(self.content)).render(context))
+        template = get_template(self.template % template_pack)
+        return render_template(template, context, {'button': button})
 
 
 class Container(Div):
@@ -210,15 +207,34 @@ class Container(Div):
         """
         check if field_name is contained within tab.
         """
-        return field_name in map(lambda pointer: pointer[1], self.get_field_names())
+        return any(
+            isinstance(layout_object, string_types) and layout_object == field_name
+            for path, layout_object in self.iter_layout_objects(greedy=True)
+        )
 
-    def render(self, form, form_style, context, template_pack=TEMPLATE_PACK, **kwargs):
-        if self.active:
+    def get_css_class(self, active):
+        """
+        Returns the container's CSS class, with `active` added if it's `active`
+        """
+        if active:
             if not 'active' in self.css_class:
-                self.css_class += ' active'
-        else:
-            self.css_class = self.css_class.replace('active', '')
-        return super(Container, self).render(form, form_style, context, template_pack)
+                return self.css_class + ' active'
+            return self.css_class
+        return self.css_class.replace('active', '')
+
+    def get_render_state(self, active, **kwargs):
+        return RenderState(self, active=active, css_class=self.get_css_class(active))
+
+    def render(self, form, form_style, context, template_pack=TEMPLATE_PACK, active=None, **kwargs):
+        """
+        Renders the container open if `active`, by default `self.active`
+        """
+        if active is None:
+            active = self.active
+        container = self.get_render_state(active, **kwargs)
+        fields = self.get_rendered_fields(form, form_style, context, template_pack)
+        template = get_template(self.get_template_name(template_pack))
+        return template.render({'div': container, 'fields': fields})
 
 
 class ContainerHolder(Div):
@@ -235,6 +251,19 @@ class ContainerHolder(Div):
                 return tab
         return None
 
+    def get_open_container(self, form):
+        """
+        Returns the container that should be open, without changing it. This is the
+        first container with errors, or the first container unless it was originally
+        given an `active` value. Returns None otherwise.
+        """
+        target = self.first_container_with_errors(form.errors.keys())
+        if target is None:
+            target = self.fields[0]
+            if target._active_originally_included:
+                return None
+        return target
+
     def open_target_group_for_form(self, form):
         """
         Makes sure that the first group that should be open is open.
@@ -263,13 +292,14 @@ class Tab(Container):
     css_class = 'tab-pane'
     link_template = '%s/layout/tab-link.html'
 
-    def render_link(self, template_pack=TEMPLATE_PACK, **kwargs):
+    def render_link(self, template_pack=TEMPLATE_PACK, active=None, **kwargs):
         """
-        Render the link for the tab-pane. It must be called after render so css_class is updated
-        with active if needed.
+        Render the link for the tab-pane, marked as active if `active`, by default `self.active`
         """
+        if active is None:
+            active = self.active
         link_template = self.link_template % template_pack
-        return render_to_string(link_template, {'link': self})
+        return render_to_string(link_template, {'link': RenderState(self, css_class=self.get_css_class(active))})
 
 
 class TabHolder(ContainerHolder):
@@ -284,21 +314,21 @@ class TabHolder(ContainerHolder):
     template = '%s/layout/tab.html'
 
     def render(self, form, form_style, context, template_pack=TEMPLATE_PACK, **kwargs):
-        for tab in self.fields:
-            tab.active = False
-
-        # Open the group that should be open.
-        self.open_target_group_for_form(form)
-        content = self.get_rendered_fields(form, form_style, context, template_pack)
-        links = ''.join(tab.render_link(template_pack) for tab in self.fields)
+        # Open the tab that should be open, and only that one
+        open_tab = self.get_open_container(form)
+        content = ''.join(
+            tab.render(form, form_style, context, template_pack, active=tab is open_tab)
+            if isinstance(tab, Tab) else render_field(tab, form, form_style, context, template_pack=template_pack)
+            for tab in self.fields
+        )
+        links = ''.join(tab.render_link(template_pack, active=tab is open_tab) for tab in self.fields)
 
-        context.update({
+        template = get_template(self.get_template_name(template_pack))
+        return render_template(template, context, {
             'tabs': self,
             'links': links,
             'content': content
         })
-        template = self.get_template_name(template_pack)
-        return render_to_string(template, context.flatten())
 
 
 class AccordionGroup(Container):
@@ -311,6 +341,12 @@ class AccordionGroup(Container):
     template = "%s/accordion-group.html"
     data_parent = ""  # accordion parent div id.
 
+    def get_render_state(self, active, data_parent=None, **kwargs):
+        state = super(AccordionGroup, self).get_render_state(active)
+        if data_parent is not None:
+            state.data_parent = data_parent
+        return state
+
 
 class Accordion(ContainerHolder):
     """
@@ -323,27 +359,28 @@ class Accordion(ContainerHolder):
     """
     template = "%s/accordion.html"
 
-    def render(self, form, form_style, context, template_pack=TEMPLATE_PACK, **kwargs):
-        content = ''
+    def __init__(self, *fields, **kwargs):
+        super(Accordion, self).__init__(*fields, **kwargs)
 
         # accordion group needs the parent div id to set `data-parent` (I don't
         # know why). This needs to be a unique id
         if not self.css_id:
             self.css_id = "-".join(["accordion", text_type(randint(1000, 9999))])
 
+    def render(self, form, form_style, context, template_pack=TEMPLATE_PACK, **kwargs):
         # Open the group that should be open.
-        self.open_target_group_for_form(form)
+        open_group = self.get_open_container(form)
 
-        for group in self.fields:
-            group.data_parent = self.css_id
-            content += render_field(
-                group, form, form_style, context, template_pack=template_pack, **kwargs
+        content = ''.join(
+            group.render(
+                form, form_style, context, template_pack,
+                active=group.active or group is open_group, data_parent=self.css_id
             )
+            for group in self.fields
+        )
 
-        template = self.get_template_name(template_pack)
-        context.update({'accordion': self, 'content': content})
-
-        return render_to_string(template, context.flatten())
+        template = get_template(self.get_template_name(template_pack))
+        return render_template(template, context, {'accordion': self, 'content': content})
 
 
 class Alert(Div):
@@ -365,10 +402,10 @@ class Alert(Div):
         self.dismiss = dismiss
 
     def render(self, form, form_style, context, template_pack=TEMPLATE_PACK, **kwargs):
-        template = self.get_template_name(template_pack)
-        context.update({'alert': self, 'content': self.content, 'dismiss': self.dismiss})
-
-        return render_to_string(template, context.flatten())
+        template = get_template(self.get_template_name(template_pack))
+        return render_template(template, context, {
+            'alert': self, 'content': self.content, 'dismiss': self.dismiss
+        })
 
 
 class UneditableField(Field):
@@ -33,3 +33,18 @@ except ImportError:
             return memoize(function, cache_dict, 1)
 
         return decorator
+
+
+def get_node_render(node):
+    """
+    Returns the method rendering template `node`: `render_annotated`, which adds template
+    debug information to exceptions, or `render` in Django < 1.9
+    """
+    return getattr(node, 'render_annotated', node.render)
+
+
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:
+    # Python 2 without the `futures` backport
+    ThreadPoolExecutor = None
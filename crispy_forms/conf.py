@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+
+# crispy-forms settings and their default values
+DEFAULTS = {
+    'CRISPY_TEMPLATE_PACK': 'bootstrap',
+    'CRISPY_ALLOWED_TEMPLATE_PACKS': ('bootstrap', 'uni_form', 'bootstrap3', 'bootstrap4'),
+    'CRISPY_FAIL_SILENTLY': True,
+    'CRISPY_CLASS_CONVERTERS': {},
+    'CRISPY_TEMPLATE_CACHE_SIZE': 512,
+    'CRISPY_RENDER_WORKERS': 1,
+    'CRISPY_NATIVE_FIELD_RENDERING': False,
+    'CRISPY_COMPILED_TEMPLATES': None,
+}
+
+
+class CrispySettings(object):
+    """
+    Snapshot of crispy-forms settings, read without the `CRISPY_` prefix::
+
+        crispy_settings.FAIL_SILENTLY
+
+    A setting is read from `django.conf.settings` the first time it's used and kept as
+    an attribute, which is much cheaper to look up than `getattr(settings, ...)` for
+    every field rendered. It is read again after Django's `setting_changed` signal is
+    sent for it, as `override_settings` does.
+    """
+    def __getattr__(self, name):
+        setting = 'CRISPY_' + name
+        if setting not in DEFAULTS:
+            raise AttributeError(name)
+        value = getattr(settings, setting, DEFAULTS[setting])
+        self.__dict__[name] = value
+        return value
+
+    def reload(self, setting=None):
+        """
+        Forgets the value of `setting`, or of every setting if None
+        """
+        if setting is None:
+            self.__dict__.clear()
+        elif setting.startswith('CRISPY_'):
+            self.__dict__.pop(setting[len('CRISPY_'):], None)
+
+
+crispy_settings = CrispySettings()
+
+
+@receiver(setting_changed)
+def reload_crispy_settings(**kwargs):
+    if kwargs['setting'] in DEFAULTS:
+        crispy_settings.reload(kwargs['setting'])
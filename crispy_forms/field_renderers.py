@@ -0,0 +1,389 @@
+# -*- coding: utf-8 -*-
+"""
+Python versions of the `field.html` templates of the template packs shipped with
+crispy-forms. They return exactly what the templates render, whitespace included, but
+without the cost of rendering templates and their includes for every field. They are
+used when `CRISPY_NATIVE_FIELD_RENDERING` setting is True, for templates that haven't
+been overridden.
+"""
+import os
+from weakref import WeakKeyDictionary
+
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.template import Variable, VariableDoesNotExist
+from django.template.base import render_value_in_context
+from django.utils.encoding import force_text
+from django.utils.safestring import mark_safe
+
+from crispy_forms.template_cache import get_template
+from crispy_forms.templatetags.crispy_forms_field import get_widget_kind, render_crispy_field
+
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+MISSING = object()
+
+
+class FieldContext(object):
+    """
+    Variables lookups and output of a field template, with the same results as Django
+    template language: `{{ name }}` is `context.text('name')` and `{% if name %}` is
+    `context.true('name')`.
+    """
+    def __init__(self, context):
+        self.context = context
+
+    def get(self, name):
+        value = self.context.get(name, MISSING)
+        if callable(value):
+            # Let Django decide whether it is called
+            try:
+                return Variable(name).resolve(self.context)
+            except VariableDoesNotExist:
+                return MISSING
+        return value
+
+    def true(self, name):
+        value = self.get(name)
+        return value is not MISSING and bool(value)
+
+    def text(self, name):
+        return self.escape(self.get(name))
+
+    def escape(self, value):
+        if value is MISSING:
+            return ''
+        return render_value_in_context(value, self.context)
+
+
+def render_uni_form_field(field, context):
+    kind = get_widget_kind(field.field.widget.__class__)
+    c = FieldContext(context)
+    if field.is_hidden:
+        return mark_safe('\n\n\n    %s\n\n' % c.escape(field))
+
+    auto_id = c.escape(field.auto_id)
+    errors = field.errors
+    form_show_errors = c.true('form_show_errors')
+    css_classes = field.css_classes()
+
+    html = ['\n\n\n    <div id="div_', auto_id, '" class="ctrlHolder']
+    if c.true('wrapper_class'):
+        html += [' ', c.text('wrapper_class')]
+    if errors and form_show_errors:
+        html.append(' error')
+    if kind.is_checkbox:
+        html.append(' checkbox')
+    if css_classes:
+        html += [' ', c.escape(css_classes)]
+    html.append('">\n        ')
+
+    if form_show_errors:
+        html.append('\n            ')
+        for counter, error in enumerate(errors, 1):
+            html += [
+                '\n                <p id="error_', c.escape(counter), '_', auto_id, '" class="errorField">',
+                '\n                    ', c.escape(error), '\n                </p>\n            ',
+            ]
+        html.append('\n        ')
+    html.append('\n\n        ')
+
+    if field.label:
+        html.append('\n            ')
+        if kind.is_checkbox:
+            html += ['\n                ', render_crispy_field(field, context), '\n            ']
+        html += ['\n\n            <label for="', c.escape(field.id_for_label), '" ']
+        if field.field.required:
+            html.append('class="requiredField"')
+        html += ['>\n                ', force_text(field.label)]
+        if field.field.required:
+            html.append('<span class="asteriskField">*</span>')
+        html.append('\n            </label>\n        ')
+    html.append('\n\n        ')
+
+    if not kind.is_checkbox:
+        html += ['\n            ', render_crispy_field(field, context), '\n        ']
+    html.append('\n\n        ')
+
+    if field.help_text:
+        html += [
+            '\n            <div id="hint_', auto_id, '" class="formHint">', force_text(field.help_text),
+            '</div>\n        ',
+        ]
+    html.append('\n    </div>\n\n')
+
+    return mark_safe(''.join(html))
+
+
+def render_help_text(c, field, auto_id, inline_class):
+    # `layout/help_text.html`
+    html = []
+    if field.help_text:
+        html.append('\n    ')
+        if c.true('help_text_inline'):
+            html += [
+                '\n        <span id="hint_', auto_id, '" class="', inline_class, '">',
+                force_text(field.help_text), '</span>\n    ',
+            ]
+        else:
+            html += [
+                '\n        <p id="hint_', auto_id, '" class="help-block">', force_text(field.help_text),
+                '</p>\n    ',
+            ]
+        html.append('\n')
+    html.append('\n')
+    return html
+
+
+def render_field_errors(c, field, auto_id, tag, css_class):
+    # `layout/field_errors.html` and `layout/field_errors_block.html`
+    html = []
+    if c.true('form_show_errors') and field.errors:
+        html.append('\n    ')
+        for counter, error in enumerate(field.errors, 1):
+            html += [
+                '\n        <', tag, ' id="error_', c.escape(counter), '_', auto_id, '" class="', css_class,
+                '"><strong>', c.escape(error), '</strong></', tag, '>\n    ',
+            ]
+        html.append('\n')
+    html.append('\n')
+    return html
+
+
+def render_help_text_and_errors(c, field, auto_id, inline_class):
+    # `layout/help_text_and_errors.html`
+    html = []
+    help_text_inline = c.true('help_text_inline')
+    error_text_inline = c.true('error_text_inline')
+    if help_text_inline and not error_text_inline:
+        html += ['\n    '] + render_help_text(c, field, auto_id, inline_class) + ['\n']
+    html.append('\n\n')
+
+    if error_text_inline:
+        html += ['\n    '] + render_field_errors(c, field, auto_id, 'span', inline_class) + ['\n']
+    else:
+        html += ['\n    '] + render_field_errors(c, field, auto_id, 'p', 'help-block') + ['\n']
+    html.append('\n\n')
+
+    if not help_text_inline:
+        html += ['\n    '] + render_help_text(c, field, auto_id, inline_class) + ['\n']
+    html.append('\n')
+    return html
+
+
+def render_bootstrap_field(field, context):
+    kind = get_widget_kind(field.field.widget.__class__)
+    if kind.is_checkboxselectmultiple or kind.is_radioselect:
+        return None
+
+    c = FieldContext(context)
+    if field.is_hidden:
+        return mark_safe('\n\n\n    %s\n\n' % c.escape(field))
+
+    auto_id = c.escape(field.auto_id)
+    tag = c.text('tag') if c.true('tag') else 'div'
+    form_show_labels = c.true('form_show_labels')
+    css_classes = field.css_classes()
+
+    html = ['\n\n\n    <', tag, ' id="div_', auto_id, '" class="control-group']
+    if c.true('wrapper_class'):
+        html += [' ', c.text('wrapper_class')]
+    if c.true('form_show_errors') and field.errors:
+        html.append(' error')
+    if css_classes:
+        html += [' ', c.escape(css_classes)]
+    html.append('">\n        ')
+
+    if field.label and not kind.is_checkbox and form_show_labels:
+        html += ['\n            <label for="', c.escape(field.id_for_label), '" class="control-label ']
+        if field.field.required:
+            html.append('requiredField')
+        html += ['">\n                ', force_text(field.label)]
+        if field.field.required:
+            html.append('<span class="asteriskField">*</span>')
+        html.append('\n            </label>\n        ')
+    html.append('\n\n        \n\n        \n\n        \n            <div class="controls">\n                ')
+
+    if kind.is_checkbox and form_show_labels:
+        html += ['\n                    <label for="', c.escape(field.id_for_label), '" class="checkbox ']
+        if field.field.required:
+            html.append('requiredField')
+        html += [
+            '">\n                        ', render_crispy_field(field, context),
+            '\n                        ', force_text(field.label), '\n                        ',
+        ]
+        html += render_help_text_and_errors(c, field, auto_id, 'help-inline')
+        html.append('\n                    </label>\n                ')
+    else:
+        html += ['\n                    ', render_crispy_field(field, context), '\n                    ']
+        html += render_help_text_and_errors(c, field, auto_id, 'help-inline')
+        html.append('\n                ')
+    html += ['\n            </div>\n        \n    </', tag, '>\n\n']
+
+    return mark_safe(''.join(html))
+
+
+def render_bootstrap3_field(field, context, form_group='form-group'):
+    kind = get_widget_kind(field.field.widget.__class__)
+    if kind.is_checkboxselectmultiple or kind.is_radioselect:
+        return None
+
+    c = FieldContext(context)
+    if field.is_hidden:
+        return mark_safe('\n\n\n    %s\n\n' % c.escape(field))
+
+    auto_id = c.escape(field.auto_id)
+    tag = c.text('tag') if c.true('tag') else 'div'
+    label_class = c.true('label_class')
+    form_show_labels = c.true('form_show_labels')
+    css_classes = field.css_classes()
+
+    html = ['\n\n\n    ']
+    if kind.is_checkbox:
+        html += ['\n        <div class="', form_group, '">\n        ']
+        if label_class:
+            html += [
+                '\n            <div class="controls col-', c.text('bootstrap_device_type'), '-offset-',
+                c.text('label_size'), ' ', c.text('field_class'), '">\n        ',
+            ]
+        html.append('\n    ')
+
+    html += ['\n    <', tag, ' id="div_', auto_id, '" ']
+    if not kind.is_checkbox:
+        html += ['class="', form_group]
+    else:
+        html.append('class="checkbox')
+    if c.true('wrapper_class'):
+        html += [' ', c.text('wrapper_class')]
+    if c.true('form_show_errors') and field.errors:
+        html.append(' has-error')
+    if css_classes:
+        html += [' ', c.escape(css_classes)]
+    html.append('">\n        ')
+
+    if field.label and not kind.is_checkbox and form_show_labels:
+        html += [
+            '\n            <label for="', c.escape(field.id_for_label), '" class="control-label ',
+            c.text('label_class'),
+        ]
+        if field.field.required:
+            html.append(' requiredField')
+        html += ['">\n                ', force_text(field.label)]
+        if field.field.required:
+            html.append('<span class="asteriskField">*</span>')
+        html.append('\n            </label>\n        ')
+    html.append('\n\n        \n\n        \n\n        \n            ')
+
+    if kind.is_checkbox and form_show_labels:
+        html += ['\n                <label for="', c.escape(field.id_for_label), '" class="']
+        if field.field.required:
+            html.append(' requiredField')
+        html += [
+            '">\n                    ', render_crispy_field(field, context),
+            '\n                    ', force_text(field.label), '\n                    ',
+        ]
+        html += render_help_text_and_errors(c, field, auto_id, 'help-block')
+        html.append('\n                </label>\n            ')
+    else:
+        html += [
+            '\n                <div class="controls ', c.text('field_class'), '">\n                    ',
+            render_crispy_field(field, context), '\n                    ',
+        ]
+        html += render_help_text_and_errors(c, field, auto_id, 'help-block')
+        html.append('\n                </div>\n            ')
+    html += ['\n        \n    </', tag, '>\n    ']
+
+    if kind.is_checkbox:
+        html.append('\n        ')
+        if label_class:
+            html.append('\n            </div>\n        ')
+        html.append('\n        </div>\n    ')
+    html.append('\n\n')
+
+    return mark_safe(''.join(html))
+
+
+def render_bootstrap4_field(field, context):
+    return render_bootstrap3_field(field, context, form_group='form-group row')
+
+
+# Renderers of each template pack's `field.html` and the templates they replace
+field_renderers = {
+    'uni_form': (render_uni_form_field, ['uni_form/field.html']),
+    'bootstrap': (render_bootstrap_field, [
+        'bootstrap/field.html',
+        'bootstrap/layout/help_text_and_errors.html',
+        'bootstrap/layout/help_text.html',
+        'bootstrap/layout/field_errors.html',
+        'bootstrap/layout/field_errors_block.html',
+    ]),
+    'bootstrap3': (render_bootstrap3_field, [
+        'bootstrap3/field.html',
+        'bootstrap3/layout/help_text_and_errors.html',
+        'bootstrap3/layout/help_text.html',
+        'bootstrap3/layout/field_errors.html',
+        'bootstrap3/layout/field_errors_block.html',
+    ]),
+    'bootstrap4': (render_bootstrap4_field, [
+        'bootstrap4/field.html',
+        'bootstrap4/layout/help_text_and_errors.html',
+        'bootstrap4/layout/help_text.html',
+        'bootstrap4/layout/field_errors.html',
+        'bootstrap4/layout/field_errors_block.html',
+    ]),
+}
+
+
+def is_crispy_template(template, template_name):
+    """
+    Returns whether loaded `template` is crispy-forms' own `template_name`
+    """
+    origin = getattr(getattr(template, 'template', template), 'origin', None)
+    if origin is None or not origin.name:
+        return False
+    path = os.path.join(TEMPLATES_DIR, *template_name.split('/'))
+    return os.path.realpath(origin.name) == os.path.realpath(path)
+
+
+def find_field_renderer(template):
+    engine = getattr(template, 'template', template).engine
+    if engine.string_if_invalid:
+        return None
+
+    for renderer, template_names in field_renderers.values():
+        if is_crispy_template(template, template_names[0]):
+            if all(is_crispy_template(get_template(name), name) for name in template_names[1:]):
+                return renderer
+            return None
+    return None
+
+
+# Renderer, or None, of every field template loaded, see `get_field_renderer`. Entries go
+# away with their templates.
+loaded_field_renderers = WeakKeyDictionary()
+
+
+def get_field_renderer(template):
+    """
+    Returns the function replacing loaded `template`, or None if it's not a `field.html`
+    of crispy-forms, or it or the templates it includes are overridden. Renderers are
+    called like `renderer(bound_field, context)` and return None for fields
+    they can't render, which have to be rendered using the template. The result is
+    remembered per template, unless the template engine is in debug mode, where
+    templates are loaded again every time.
+    """
+    if getattr(template, 'template', template).engine.debug:
+        return find_field_renderer(template)
+
+    try:
+        return loaded_field_renderers[template]
+    except KeyError:
+        renderer = loaded_field_renderers[template] = find_field_renderer(template)
+        return renderer
+
+
+@receiver(setting_changed)
+def clear_field_renderers(**kwargs):
+    if kwargs['setting'] in ('TEMPLATES', 'TEMPLATE_DIRS', 'TEMPLATE_LOADERS', 'INSTALLED_APPS'):
+        loaded_field_renderers.clear()
@@ -1,16 +1,73 @@
 # -*- coding: utf-8 -*-
 import re
+from weakref import WeakKeyDictionary
 
-from django.core.urlresolvers import reverse, NoReverseMatch
+from django.core.urlresolvers import NoReverseMatch, get_resolver, get_script_prefix, get_urlconf, reverse
 from django.utils.safestring import mark_safe
+from django.utils.translation import get_language
 
 from crispy_forms.compatibility import string_types
 from crispy_forms.layout import Layout
-from crispy_forms.layout_slice import LayoutSlice
+from crispy_forms.layout_slice import BatchLayoutSlice, LayoutSlice
+from crispy_forms.render_plan import compile_layout, get_render_plan, render_method_owner
+from crispy_forms.selectors import compile_selector
 from crispy_forms.utils import render_field, flatatt, TEMPLATE_PACK, list_intersection, list_difference
 from crispy_forms.exceptions import FormHelpersException
 
 
+MISSING = object()
+
+# Helper attributes `get_attributes` results depend on, besides `attrs`, `inputs`, the form
+# action and instance attributes. They are read on every call, since subclasses can make
+# them properties or class attributes, which can change without setting them on the helper.
+ATTRIBUTES_DEPENDENCIES = (
+    'form_method', 'form_tag', 'form_style', 'form_show_errors', 'help_text_inline',
+    'error_text_inline', 'html5_required', 'form_show_labels', 'disable_csrf', 'label_class',
+    'field_class', 'include_media', 'form_id', 'form_class', 'form_error_title',
+    'formset_error_title',
+)
+
+# Reversed form actions of every URL resolver, keyed by (action, script prefix, language).
+# Resolvers reverse URLs per language, translated URL patterns can be anywhere.
+# `clear_url_caches` replaces resolvers, so their actions are reversed again.
+reversed_actions = WeakKeyDictionary()
+
+# Form actions starting like this are URLs or paths, never URL names
+URL_PATH_RE = re.compile(r'^(?:/|#|\?|https?://)')
+
+
+def is_url_path(action):
+    """
+    Returns whether form `action` is a URL or path itself, not something to reverse: an
+    empty action or one starting with `/`, `#`, `?`, `http://` or `https://`. Any other
+    action is reversed, and used as is if it can't be.
+    """
+    return not action or isinstance(action, string_types) and URL_PATH_RE.match(action) is not None
+
+
+def reverse_action(action):
+    """
+    Returns the URL of form `action`, a URL name or view to reverse or a URL itself,
+    reversing it once per URLconf
+    """
+    if is_url_path(action):
+        return action
+
+    actions = reversed_actions.setdefault(get_resolver(get_urlconf()), {})
+    key = (action, get_script_prefix(), get_language())
+    try:
+        return actions[key]
+    except KeyError:
+        pass
+
+    try:
+        url = reverse(action)
+    except NoReverseMatch:
+        url = action
+    actions[key] = url
+    return url
+
+
 class DynamicLayoutHandler(object):
     def _check_layout(self):
         if self.layout is None:
@@ -21,12 +78,18 @@ class DynamicLayoutHandler(object):
         if self.form is None:
             raise FormHelpersException("You need to pass a form instance to your FormHelper")
 
+    def get_slice(self, key):
+        """
+        Returns the LayoutSlice of the layout objects pointed by `key`
+        """
+        return LayoutSlice(self.layout, key)
+
     def all(self):
         """
         Returns all layout objects of first level of depth
         """
         self._check_layout()
-        return LayoutSlice(self.layout, slice(0, len(self.layout.fields), 1))
+        return self.get_slice(slice(0, len(self.layout.fields), 1))
 
     def filter(self, *LayoutClasses, **kwargs):
         """
@@ -35,39 +98,54 @@ class DynamicLayoutHandler(object):
         self._check_layout()
         max_level = kwargs.pop('max_level', 0)
         greedy = kwargs.pop('greedy', False)
-        filtered_layout_objects = self.layout.get_layout_objects(LayoutClasses, max_level=max_level, greedy=greedy)
+        filtered_layout_objects = self.layout.get_layout_index().get_layout_objects(
+            LayoutClasses, max_level=max_level, greedy=greedy
+        )
 
-        return LayoutSlice(self.layout, filtered_layout_objects)
+        return self.get_slice(filtered_layout_objects)
+
+    def select(self, selector):
+        """
+        Returns a LayoutSlice pointing to layout objects matching `selector`, like
+        `'Fieldset > Div Field[name^=addr_]'`, see `crispy_forms.selectors`
+        """
+        self._check_layout()
+        items = compile_selector(selector).select(self.layout, self.layout.get_layout_index())
+        return self.get_slice([
+            [list(path), layout_object if isinstance(layout_object, string_types)
+             else layout_object.__class__.__name__.lower()]
+            for path, layout_object in items
+        ])
 
     def filter_by_widget(self, widget_type):
         """
         Returns a LayoutSlice pointing to fields with widgets of `widget_type`
         """
         self._check_layout_and_form()
-        layout_field_names = self.layout.get_field_names()
+        layout_field_names = self.layout.get_layout_index().field_names
 
         # Let's filter all fields with widgets like widget_type
         filtered_fields = []
-        for pointer in layout_field_names:
-            if isinstance(self.form.fields[pointer[1]].widget, widget_type):
-                filtered_fields.append(pointer)
+        for path, field_name in layout_field_names:
+            if isinstance(self.form.fields[field_name].widget, widget_type):
+                filtered_fields.append([list(path), field_name])
 
-        return LayoutSlice(self.layout, filtered_fields)
+        return self.get_slice(filtered_fields)
 
     def exclude_by_widget(self, widget_type):
         """
         Returns a LayoutSlice pointing to fields with widgets NOT matching `widget_type`
         """
         self._check_layout_and_form()
-        layout_field_names = self.layout.get_field_names()
+        layout_field_names = self.layout.get_layout_index().field_names
 
         # Let's exclude all fields with widgets like widget_type
         filtered_fields = []
-        for pointer in layout_field_names:
-            if not isinstance(self.form.fields[pointer[1]].widget, widget_type):
-                filtered_fields.append(pointer)
+        for path, field_name in layout_field_names:
+            if not isinstance(self.form.fields[field_name].widget, widget_type):
+                filtered_fields.append([list(path), field_name])
 
-        return LayoutSlice(self.layout, filtered_fields)
+        return self.get_slice(filtered_fields)
 
     def __getitem__(self, key):
         """
@@ -81,24 +159,23 @@ class DynamicLayoutHandler(object):
             if hasattr(self, key):
                 return getattr(self, key)
 
-            self._check_layout()
-            layout_field_names = self.layout.get_field_names()
-
-            filtered_field = []
-            for pointer in layout_field_names:
-                # There can be an empty pointer
-                if len(pointer) == 2 and pointer[1] == key:
-                    filtered_field.append(pointer)
+            return self.get_field_slice(key)
 
-            return LayoutSlice(self.layout, filtered_field)
+        return self.get_slice(key)
 
-        return LayoutSlice(self.layout, key)
+    def get_field_slice(self, field_name):
+        """
+        Returns a LayoutSlice pointing to every field named `field_name`
+        """
+        self._check_layout()
+        paths = self.layout.get_layout_index().names.get(field_name, [])
+        return self.get_slice([[list(path), field_name] for path in paths])
 
     def __setitem__(self, key, value):
         self.layout[key] = value
 
     def __delitem__(self, key):
-        del self.layout.fields[key]
+        del self.layout[key]
 
     def __len__(self):
         if self.layout is not None:
@@ -107,6 +184,58 @@ class DynamicLayoutHandler(object):
             return 0
 
 
+class LayoutBatch(DynamicLayoutHandler):
+    """
+    Dynamic API of a helper whose operations are collected and applied to the layout in
+    one go, in the order they were made, when the `with` block is left without errors::
+
+        with helper.batch() as batch:
+            batch['email'].wrap(Field, css_class='email')
+            batch.filter(Div).update_attributes(css_class='box')
+
+    Field names, filters and selectors are looked up when called, in the layout as it was
+    when the batch started, so they all use the same index, which is built again once at
+    most. They don't find layout objects added by operations of the batch, and keep finding
+    the layout objects they found once these are wrapped, so wrapping a field twice wraps
+    it twice. Positions, like `batch[0:2]`, are those of the layout when an operation is
+    applied.
+    """
+    def __init__(self, helper):
+        self.layout = helper.layout
+        self.form = helper.form
+        self.operations = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.apply()
+
+    def __getitem__(self, key):
+        # There are no helper attributes to access here
+        if isinstance(key, string_types):
+            return self.get_field_slice(key)
+        return self.get_slice(key)
+
+    def __setitem__(self, key, value):
+        self.operations.append((self.layout.__setitem__, (key, value), {}))
+
+    def __delitem__(self, key):
+        self.operations.append((self.layout.__delitem__, (key,), {}))
+
+    def get_slice(self, key):
+        return BatchLayoutSlice(LayoutSlice(self.layout, key), self.operations)
+
+    def apply(self):
+        """
+        Applies the operations collected to the layout
+        """
+        operations, self.operations = self.operations, []
+        for function, args, kwargs in operations:
+            function(*args, **kwargs)
+
+
 class FormHelper(DynamicLayoutHandler):
     """
     This class controls the form rendering behavior of the form passed to
@@ -151,6 +280,10 @@ class FormHelper(DynamicLayoutHandler):
         **include_media**: Whether to automatically include form media. Set to False if
             you want to manually include form media outside the form. Defaults to True.
 
+        **render_workers**: Number of threads rendering the layouts of a formset's forms in
+            parallel. Defaults to the `CRISPY_RENDER_WORKERS` setting, or 1, rendering them
+            one after the other.
+
     Public Methods:
 
         **add_input(input)**: You can add input buttons using this method. Inputs
@@ -160,6 +293,9 @@ class FormHelper(DynamicLayoutHandler):
             specifies in a simple, clean and DRY way how the form fields should be rendered.
             You can wrap fields, order them, customize pretty much anything in the form.
 
+        **compile(template_pack)**: Compiles the helper's layout into a cached render plan,
+            that will be used from then on to render the layout in that template pack.
+
     Best way to add a helper to a form is adding a property named helper to the form
     that returns customized `FormHelper` object::
 
@@ -207,6 +343,7 @@ class FormHelper(DynamicLayoutHandler):
     label_class = ''
     field_class = ''
     include_media = True
+    render_workers = None
 
     def __init__(self, form=None):
         self.attrs = {}
@@ -233,10 +370,7 @@ class FormHelper(DynamicLayoutHandler):
 
     @property
     def form_action(self):
-        try:
-            return reverse(self._form_action)
-        except NoReverseMatch:
-            return self._form_action
+        return reverse_action(self._form_action)
 
     @form_action.setter
     def form_action(self, action):
@@ -276,26 +410,62 @@ class FormHelper(DynamicLayoutHandler):
         self._error_text_inline = flag
         self._help_text_inline = not flag
 
+    def __setattr__(self, name, value):
+        # Attributes cached by `get_attributes` are computed again once any attribute changes
+        if self.__dict__.get(name, MISSING) is not value:
+            self.__dict__.pop('_attributes_cache', None)
+        super(FormHelper, self).__setattr__(name, value)
+
     def add_input(self, input_object):
         self.inputs.append(input_object)
 
     def add_layout(self, layout):
         self.layout = layout
 
+    def batch(self):
+        """
+        Returns a `LayoutBatch` for changing the layout with many operations at once
+        """
+        self._check_layout()
+        return LayoutBatch(self)
+
+    def compile(self, template_pack=TEMPLATE_PACK):
+        """
+        Compiles `self.layout` into a `RenderPlan` for `template_pack`. Plans are cached
+        per layout and recompiled when the layout changes, once a layout has been compiled
+        `render_layout` uses its plan instead of walking the layout tree.
+        """
+        self._check_layout()
+        return compile_layout(self.layout, template_pack, self.field_template)
+
     def render_layout(self, form, context, template_pack=TEMPLATE_PACK):
         """
         Returns safe html of the rendering of the layout
         """
+        return mark_safe(''.join(self.iter_layout(form, context, template_pack)))
+
+    def iter_layout(self, form, context, template_pack=TEMPLATE_PACK):
+        """
+        Renders the layout yielding the html of its top level fields and layout objects
+        one at a time, followed by the extra fields rendered.
+        """
         form.rendered_fields = set()
         form.crispy_field_template = self.field_template
 
+        # Flattening the context once per form keeps it shallow for every template rendered
+        context = context.new(context.flatten())
+
         # This renders the specified Layout strictly
-        html = self.layout.render(
-            form,
-            self.form_style,
-            context,
-            template_pack=template_pack
-        )
+        plan = get_render_plan(self.layout, template_pack, self.field_template)
+        if plan is not None:
+            chunks = plan.iter_render(form, self.form_style, context)
+        elif render_method_owner(self.layout) is Layout:
+            chunks = self.layout.iter_rendered_fields(form, self.form_style, context, template_pack)
+        else:
+            chunks = [self.layout.render(form, self.form_style, context, template_pack=template_pack)]
+
+        for html in chunks:
+            yield html
 
         # Rendering some extra fields if specified
         if self.render_unmentioned_fields or self.render_hidden_fields or self.render_required_fields:
@@ -307,7 +477,7 @@ class FormHelper(DynamicLayoutHandler):
                     self.render_hidden_fields and form.fields[field].widget.is_hidden or
                     self.render_required_fields and form.fields[field].widget.is_required
                 ):
-                    html += render_field(
+                    yield render_field(
                         field,
                         form,
                         self.form_style,
@@ -326,14 +496,34 @@ class FormHelper(DynamicLayoutHandler):
                 left_fields_to_render = list_difference(fields_to_render, form.rendered_fields)
 
                 for field in left_fields_to_render:
-                    html += render_field(field, form, self.form_style, context)
-
-        return mark_safe(html)
+                    yield render_field(field, form, self.form_style, context)
 
     def get_attributes(self, template_pack=TEMPLATE_PACK):
         """
-        Used by crispy_forms_tags to get helper attributes
+        Used by crispy_forms_tags to get helper attributes. They are computed once per
+        template pack and cached until an attribute of the helper is set. `attrs` and
+        `inputs` changed in place, the form action and `ATTRIBUTES_DEPENDENCIES`, which
+        may be properties or class attributes, are checked on every call.
         """
+        form_action = self.form_action
+        dependencies = tuple(getattr(self, name) for name in ATTRIBUTES_DEPENDENCIES)
+        cache = self.__dict__.setdefault('_attributes_cache', {})
+        try:
+            attrs, has_inputs, action, values, items = cache[template_pack]
+        except KeyError:
+            pass
+        else:
+            if (
+                attrs == self.attrs and has_inputs == bool(self.inputs) and action == form_action
+                and values == dependencies
+            ):
+                return dict(items)
+
+        items = self.compute_attributes(template_pack, form_action)
+        cache[template_pack] = self.attrs.copy(), bool(self.inputs), form_action, dependencies, items
+        return dict(items)
+
+    def compute_attributes(self, template_pack, form_action):
         items = {
             'form_method': self.form_method.strip(),
             'form_tag': self.form_tag,
@@ -361,8 +551,8 @@ class FormHelper(DynamicLayoutHandler):
         items['attrs'] = {}
         if self.attrs:
             items['attrs'] = self.attrs.copy()
-        if self.form_action:
-            items['attrs']['action'] = self.form_action.strip()
+        if form_action:
+            items['attrs']['action'] = form_action.strip()
         if self.form_id:
             items['attrs']['id'] = self.form_id.strip()
         if self.form_class:
@@ -1,11 +1,10 @@
 from __future__ import unicode_literals
 
-from django.template import Template
-from django.template.loader import render_to_string
 from django.utils.html import conditional_escape
 
 from crispy_forms.compatibility import string_types, text_type
-from crispy_forms.utils import render_field, flatatt, TEMPLATE_PACK, get_template_pack
+from crispy_forms.template_cache import get_template, render_template, template_from_string, TemplateText
+from crispy_forms.utils import render_field, flatatt, RenderState, TEMPLATE_PACK, get_template_pack
 
 
 class TemplateNameMixin(object):
@@ -19,15 +18,101 @@ class TemplateNameMixin(object):
         return template
 
 
+# `fields` list methods that change it
+FIELDS_CHANGING_METHODS = ('append', 'extend', 'insert', 'pop', 'remove', 'reverse', 'sort')
+
+
+class LayoutIndex(object):
+    """
+    Paths of the fields and layout objects within a layout object, by field name and by
+    class, to find them without traversing it. Paths are tuples of positions, like
+    `iter_layout_objects` yields them. See `LayoutObject.get_layout_index`.
+
+    Every layout object indexed knows the indexes it's part of, and marks them as `stale`
+    when its fields are changed through its methods, so checking an index is up to date
+    takes no time.
+    """
+    def __init__(self, layout_object):
+        self.stale = False
+        # Layout objects indexed and a copy of their fields when indexed, to detect changes
+        self.structure = [(layout_object, list(layout_object.fields))]
+        field_names = self.field_names = []
+        names = self.names = {}
+        # (path, layout object) pairs by class
+        classes = self.classes = {}
+        for item in layout_object.iter_layout_objects(greedy=True):
+            path, layout_object = item
+            if hasattr(layout_object, 'get_field_names'):
+                self.structure.append((layout_object, list(layout_object.fields)))
+            elif isinstance(layout_object, string_types):
+                field_names.append(item)
+                if layout_object in names:
+                    names[layout_object].append(path)
+                else:
+                    names[layout_object] = [path]
+
+            klass = layout_object.__class__
+            if klass in classes:
+                classes[klass].append(item)
+            else:
+                classes[klass] = [item]
+
+        for layout_object, fields in self.structure:
+            indexes = [index for index in layout_object.__dict__.get('_indexes', []) if not index.stale]
+            indexes.append(self)
+            layout_object.__dict__['_indexes'] = indexes
+
+    def is_stale(self, check_fields=False):
+        """
+        Returns True if any of the indexed layout objects has changed its fields through its
+        methods since indexed. With `check_fields`, the fields of every indexed layout object
+        are compared with the ones indexed too, to notice changes made to `fields` directly.
+        """
+        if self.stale or not check_fields:
+            return self.stale
+
+        for layout_object, fields in self.structure:
+            if layout_object.fields != fields:
+                return True
+
+        return False
+
+    def get_items(self, LayoutClasses, max_level=0, greedy=False):
+        """
+        Returns (path, layout object) pairs of layout objects of any type matching
+        `LayoutClasses`, in the order `iter_layout_objects` yields them
+        """
+        matches = [items for klass, items in self.classes.items() if issubclass(klass, LayoutClasses)]
+        items = [item for items in matches for item in items if greedy or len(item[0]) <= max_level + 1]
+        if len(matches) > 1:
+            # Paths are unique, layout objects are never compared
+            items.sort()
+        return items
+
+    def get_layout_objects(self, *LayoutClasses, **kwargs):
+        """
+        Returns the same pointers as `LayoutObject.get_layout_objects`
+        """
+        max_level = kwargs.pop('max_level', 0)
+        greedy = kwargs.pop('greedy', False)
+        items = self.get_items(LayoutClasses, max_level, greedy)
+
+        if len(LayoutClasses) == 1 and LayoutClasses[0] == string_types:
+            return [[list(path), layout_object] for path, layout_object in items]
+        return [[list(path), layout_object.__class__.__name__.lower()] for path, layout_object in items]
+
+
 class LayoutObject(TemplateNameMixin):
     def __getitem__(self, slice):
         return self.fields[slice]
 
     def __setitem__(self, slice, value):
         self.fields[slice] = value
+        self.fields_changed()
 
     def __delitem__(self, slice):
         del self.fields[slice]
+        self.fields_changed()
 
     def __len__(self):
         return len(self.fields)
@@ -39,10 +124,34 @@ class LayoutObject(TemplateNameMixin):
         """
         # Check necessary for unpickling, see #107
         if 'fields' in self.__dict__ and hasattr(self.fields, name):
+            if name in FIELDS_CHANGING_METHODS:
+                self.fields_changed()
             return getattr(self.fields, name)
         else:
             return object.__getattribute__(self, name)
 
+    def fields_changed(self):
+        """
+        Marks the layout indexes this layout object is part of as stale
+        """
+        for index in self.__dict__.pop('_indexes', []):
+            index.stale = True
+
+    def get_layout_index(self, check_fields=False):
+        """
+        Returns a `LayoutIndex` of the layout object, built once and built again after
+        the fields of the layout object, or of any layout object within, are changed through
+        their methods or the dynamic API. Changes made to `fields` lists directly, or by
+        setting `fields`, are noticed only with `check_fields`, which compares every fields
+        list with the indexed one.
+        """
+        index = self.__dict__.get('_layout_index')
+        if index is None or index.is_stale(check_fields):
+            if index is not None:
+                index.stale = True
+            index = self.__dict__['_layout_index'] = LayoutIndex(self)
+        return index
+
     def get_field_names(self, index=None):
         """
         Returns a list of lists, those lists are named pointers. First parameter
@@ -74,33 +183,56 @@ class LayoutObject(TemplateNameMixin):
         max_level = kwargs.pop('max_level', 0)
         greedy = kwargs.pop('greedy', False)
 
-        pointers = []
-
         if index is not None and not isinstance(index, list):
             index = [index]
         elif index is None:
             index = []
 
-        for i, layout_object in enumerate(self.fields):
+        field_names = len(LayoutClasses) == 1 and LayoutClasses[0] == string_types
+        pointers = []
+        for path, layout_object in self.iter_layout_objects(max_level - len(index), greedy):
             if isinstance(layout_object, LayoutClasses):
-                if len(LayoutClasses) == 1 and LayoutClasses[0] == string_types:
-                    pointers.append([index + [i], layout_object])
+                if field_names:
+                    pointers.append([index + list(path), layout_object])
                 else:
-                    pointers.append([index + [i], layout_object.__class__.__name__.lower()])
-
-            # If it's a layout object and we haven't reached the max depth limit or greedy
-            # we recursive call
-            if hasattr(layout_object, 'get_field_names') and (len(index) < max_level or greedy):
-                new_kwargs = {'index': index + [i], 'max_level': max_level, 'greedy': greedy}
-                pointers = pointers + layout_object.get_layout_objects(*LayoutClasses, **new_kwargs)
+                    pointers.append([index + list(path), layout_object.__class__.__name__.lower()])
 
         return pointers
 
+    def iter_layout_objects(self, max_level=0, greedy=False):
+        """
+        Yields a (path, layout object) pair for every field and layout object within,
+        depth first, in the order they are rendered. Path is a tuple of positions, like
+        `(0, 1, 2)` for `self[0][1][2]`. Layout objects are traversed without recursion,
+        so it takes linear time for any depth.
+
+        :param max_level: Max level depth to reach, as in `get_layout_objects`.
+        :param greedy: Whether to reach any depth.
+        """
+        paths = [()]
+        iterators = [enumerate(self.fields)]
+        while iterators:
+            for i, layout_object in iterators[-1]:
+                path = paths[-1] + (i,)
+                yield path, layout_object
+
+                if hasattr(layout_object, 'get_field_names') and (greedy or len(path) <= max_level):
+                    paths.append(path)
+                    iterators.append(enumerate(layout_object.fields))
+                    break
+            else:
+                paths.pop()
+                iterators.pop()
+
+    def iter_rendered_fields(self, form, form_style, context, template_pack=TEMPLATE_PACK, **kwargs):
+        """
+        Renders the fields of the layout object one at a time, yielding their html
+        """
+        for field in self.fields:
+            yield render_field(field, form, form_style, context, template_pack=template_pack, **kwargs)
+
     def get_rendered_fields(self, form, form_style, context, template_pack=TEMPLATE_PACK, **kwargs):
-        return ''.join(
-            render_field(field, form, form_style, context, template_pack=template_pack, **kwargs)
-            for field in self.fields
-        )
+        return ''.join(self.iter_rendered_fields(form, form_style, context, template_pack, **kwargs))
 
 
 class Layout(LayoutObject):
@@ -163,10 +295,8 @@ class ButtonHolder(LayoutObject):
     def render(self, form, form_style, context, template_pack=TEMPLATE_PACK, **kwargs):
         html = self.get_rendered_fields(form, form_style, context, template_pack, **kwargs)
 
-        template = self.get_template_name(template_pack)
-        context.update({'buttonholder': self, 'fields_output': html})
-
-        return render_to_string(template, context.flatten())
+        template = get_template(self.get_template_name(template_pack))
+        return render_template(template, context, {'buttonholder': self, 'fields_output': html})
 
 
 class BaseInput(TemplateNameMixin):
@@ -174,6 +304,7 @@ class BaseInput(TemplateNameMixin):
     A base class to reduce the amount of code in the Input classes.
     """
     template = "%s/layout/baseinput.html"
+    value = TemplateText('value')
 
     def __init__(self, name, value, **kwargs):
         self.name = name
@@ -192,11 +323,11 @@ class BaseInput(TemplateNameMixin):
         Renders an `<input />` if container is used as a Layout object.
         Input button value can be a variable in context.
         """
-        self.value = Template(text_type(self.value)).render(context)
-        template = self.get_template_name(template_pack)
-        context.update({'input': self})
-
-        return render_to_string(template, context.flatten())
+        button = self
+        if self.static_value is None:
+            button = RenderState(self, value=template_from_string(text_type(self.value)).render(context))
+        template = get_template(self.get_template_name(template_pack))
+        return render_template(template, context, {'input': button})
 
 
 class Submit(BaseInput):
@@ -272,6 +403,7 @@ class Fieldset(LayoutObject):
         )
     """
     template = "%s/layout/fieldset.html"
+    legend = TemplateText('legend')
 
     def __init__(self, legend, *fields, **kwargs):
         self.fields = list(fields)
@@ -283,14 +415,20 @@ class Fieldset(LayoutObject):
 
     def render(self, form, form_style, context, template_pack=TEMPLATE_PACK, **kwargs):
         fields = self.get_rendered_fields(form, form_style, context, template_pack, **kwargs)
+        template = get_template(self.get_template_name(template_pack))
+        return self.render_with_fields(fields, form_style, context, template)
 
+    def render_with_fields(self, fields, form_style, context, template):
+        """
+        Wraps already rendered `fields` within the fieldset using a loaded `template`.
+        """
         legend = ''
-        if self.legend:
-            legend = '%s' % Template(text_type(self.legend)).render(context)
+        if self.static_legend is not None:
+            legend = '%s' % self.static_legend
+        elif self.legend:
+            legend = '%s' % template_from_string(text_type(self.legend)).render(context)
 
-        template = self.get_template_name(template_pack)
-        return render_to_string(
-            template,
+        return template.render(
             {'fieldset': self, 'legend': legend, 'fields': fields, 'form_style': form_style}
         )
 
@@ -312,25 +450,28 @@ class MultiField(LayoutObject):
 
     def render(self, form, form_style, context, template_pack=TEMPLATE_PACK, **kwargs):
         # If a field within MultiField contains errors
+        css_class = self.css_class
         if context['form_show_errors']:
-            for field in map(lambda pointer: pointer[1], self.get_field_names()):
-                if field in form.errors:
-                    self.css_class += " error"
-
+            if any(
+                isinstance(layout_object, string_types) and layout_object in form.errors
+                for path, layout_object in self.iter_layout_objects(greedy=True)
+            ):
+                css_class += " error"
+
+        # `render_field` collects the bound fields rendered
+        multifield = RenderState(self, css_class=css_class, bound_fields=[])
         field_template = self.field_template % template_pack
         fields_output = self.get_rendered_fields(
             form, form_style, context, template_pack, template=field_template,
-            labelclass=self.label_class, layout_object=self, **kwargs
+            labelclass=self.label_class, layout_object=multifield, **kwargs
         )
 
-        template = self.get_template_name(template_pack)
-        context.update({
-            'multifield': self,
+        template = get_template(self.get_template_name(template_pack))
+        return render_template(template, context, {
+            'multifield': multifield,
             'fields_output': fields_output
         })
 
-        return render_to_string(template, context.flatten())
-
 
 class Div(LayoutObject):
     """
@@ -356,9 +497,14 @@ class Div(LayoutObject):
 
     def render(self, form, form_style, context, template_pack=TEMPLATE_PACK, **kwargs):
         fields = self.get_rendered_fields(form, form_style, context, template_pack, **kwargs)
+        template = get_template(self.get_template_name(template_pack))
+        return self.render_with_fields(fields, form_style, context, template)
 
-        template = self.get_template_name(template_pack)
-        return render_to_string(template, {'div': self, 'fields': fields})
+    def render_with_fields(self, fields, form_style, context, template):
+        """
+        Wraps already rendered `fields` within the div using a loaded `template`.
+        """
+        return template.render({'div': self, 'fields': fields})
 
 
 class Row(Div):
@@ -392,12 +538,15 @@ class HTML(object):
         HTML("{% if saved %}Data saved{% endif %}")
         HTML('<input type="hidden" name="{{ step_field }}" value="{{ step0 }}" />')
     """
+    html = TemplateText('html')
 
     def __init__(self, html):
         self.html = html
 
     def render(self, form, form_style, context, template_pack=TEMPLATE_PACK, **kwargs):
-        return Template(text_type(self.html)).render(context)
+        if self.static_html is not None:
+            return self.static_html
+        return template_from_string(text_type(self.html)).render(context)
 
 
 class Field(LayoutObject):
@@ -16,6 +16,46 @@ class LayoutSlice(object):
         else:
             self.slice = key
 
+        if isinstance(self.slice, list):
+            # A list of pointers  Ex: [[[0, 0], 'div'], [[0, 2, 3], 'field_name']]
+            self.nodes = [self.get_node(pointer[0]) for pointer in self.slice]
+
+    def get_node(self, position):
+        """
+        Returns a (parent, position, layout object) node for the layout object at `position`,
+        a list of positions like pointers have. Nodes keep pointing to the same layout object
+        when the layout changes around it, for example when it or its parent is wrapped.
+        """
+        try:
+            parent = self.layout
+            for i in position[:-1]:
+                parent = parent.fields[i]
+            return parent, position[-1], parent.fields[position[-1]]
+        except (IndexError, AttributeError):
+            raise DynamicError("There is no layout object at %s" % list(position))
+
+    def find_node(self, node):
+        """
+        Returns the current parent of `node`'s layout object and its position within it
+        """
+        parent, position, layout_object = node
+        fields = parent.fields
+        if position < len(fields) and fields[position] is layout_object:
+            return parent, position
+
+        for position, field in enumerate(fields):
+            if field is layout_object:
+                return parent, position
+
+        # It has been wrapped, it's within a layout object that took its place
+        for path, field in parent.iter_layout_objects(greedy=True):
+            if field is layout_object:
+                for i in path[:-1]:
+                    parent = parent.fields[i]
+                return parent, path[-1]
+
+        raise DynamicError("%r has been removed from its layout object" % (layout_object,))
+
     def wrapped_object(self, LayoutClass, fields, *args, **kwargs):
         """
         Returns a layout object of type `LayoutClass` with `args` and `kwargs` that
@@ -49,25 +89,8 @@ class LayoutSlice(object):
                 function(self.layout, i)
 
         elif isinstance(self.slice, list):
-            # A list of pointers  Ex: [[[0, 0], 'div'], [[0, 2, 3], 'field_name']]
-            for pointer in self.slice:
-                position = pointer[0]
-
-                # If it's pointing first level
-                if len(position) == 1:
-                    function(self.layout, position[-1])
-                else:
-                    layout_object = self.layout.fields[position[0]]
-                    for i in position[1:-1]:
-                        layout_object = layout_object.fields[i]
-
-                    try:
-                        function(layout_object, position[-1])
-                    except IndexError:
-                        # We could avoid this exception, recalculating pointers.
-                        # However this case is most of the time an undesired behavior
-                        raise DynamicError("Trying to wrap a field within an already wrapped field, \
-                            recheck your filter or layout")
+            for node in self.nodes:
+                function(*self.find_node(node))
 
     def wrap(self, LayoutClass, *args, **kwargs):
         """
@@ -75,7 +98,7 @@ class LayoutSlice(object):
         `args` and `kwargs` passed.
         """
         def wrap_object(layout_object, j):
-            layout_object.fields[j] = self.wrapped_object(
+            layout_object[j] = self.wrapped_object(
                 LayoutClass, layout_object.fields[j], *args, **kwargs
             )
 
@@ -89,7 +112,7 @@ class LayoutSlice(object):
         """
         def wrap_object_once(layout_object, j):
             if not isinstance(layout_object, LayoutClass):
-                layout_object.fields[j] = self.wrapped_object(
+                layout_object[j] = self.wrapped_object(
                     LayoutClass, layout_object.fields[j], *args, **kwargs
                 )
 
@@ -103,14 +126,14 @@ class LayoutSlice(object):
         if isinstance(self.slice, slice):
             # The start of the slice is replaced
             start = self.slice.start if self.slice.start is not None else 0
-            self.layout.fields[start] = self.wrapped_object(
+            self.layout[start] = self.wrapped_object(
                 LayoutClass, self.layout.fields[self.slice], *args, **kwargs
             )
 
             # The rest of places of the slice are removed, as they are included in the previous
             for i in reversed(range(*self.slice.indices(len(self.layout.fields)))):
                 if i != start:
-                    del self.layout.fields[i]
+                    del self.layout[i]
 
         elif isinstance(self.slice, list):
             raise DynamicError("wrap_together doesn't work with filter, only with [] operator")
@@ -125,21 +148,16 @@ class LayoutSlice(object):
                 function(self.layout.fields[i])
 
         elif isinstance(self.slice, list):
-            # A list of pointers  Ex: [[[0, 0], 'div'], [[0, 2, 3], 'field_name']]
-            for pointer in self.slice:
-                position = pointer[0]
-
-                layout_object = self.layout.fields[position[0]]
-                for i in position[1:]:
-                    previous_layout_object = layout_object
-                    layout_object = layout_object.fields[i]
+            for node in self.nodes:
+                layout_object = node[2]
 
                 # If update_attrs is applied to a string, we call to its wrapping layout object
                 if (
                     function.__name__ == 'update_attrs'
                     and isinstance(layout_object, string_types)
                 ):
-                    function(previous_layout_object)
+                    parent, position = self.find_node(node)
+                    function(parent)
                 else:
                     function(layout_object)
 
@@ -152,3 +170,32 @@ class LayoutSlice(object):
                 layout_object.attrs.update(kwargs)
 
         self.map(update_attrs)
+
+
+class BatchLayoutSlice(object):
+    """
+    LayoutSlice of a `LayoutBatch`. Its operations are added to `operations`, to be
+    applied later to `layout_slice`.
+    """
+    def __init__(self, layout_slice, operations):
+        self.layout_slice = layout_slice
+        self.operations = operations
+
+    @property
+    def slice(self):
+        return self.layout_slice.slice
+
+    def wrap(self, LayoutClass, *args, **kwargs):
+        self.operations.append((self.layout_slice.wrap, (LayoutClass,) + args, kwargs))
+
+    def wrap_once(self, LayoutClass, *args, **kwargs):
+        self.operations.append((self.layout_slice.wrap_once, (LayoutClass,) + args, kwargs))
+
+    def wrap_together(self, LayoutClass, *args, **kwargs):
+        self.operations.append((self.layout_slice.wrap_together, (LayoutClass,) + args, kwargs))
+
+    def map(self, function):
+        self.operations.append((self.layout_slice.map, (function,), {}))
+
+    def update_attributes(self, **kwargs):
+        self.operations.append((self.layout_slice.update_attributes, (), kwargs))
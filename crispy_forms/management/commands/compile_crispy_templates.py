@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import io
+import os
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.template import Engine
+
+from crispy_forms.conf import crispy_settings
+from crispy_forms.field_renderers import TEMPLATES_DIR
+from crispy_forms.template_compiler import compile_templates
+
+
+def pack_template_names(template_pack):
+    """
+    Returns the names of the templates crispy-forms ships for `template_pack`
+    """
+    names = []
+    pack_dir = os.path.join(TEMPLATES_DIR, template_pack)
+    for dirpath, dirnames, filenames in os.walk(pack_dir):
+        for filename in filenames:
+            if filename.endswith('.html'):
+                path = os.path.relpath(os.path.join(dirpath, filename), TEMPLATES_DIR)
+                names.append(path.replace(os.sep, '/'))
+    return sorted(names)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compiles the templates of crispy-forms template packs, as found by the default "
+        "template engine, so project overrides included, into a Python module used by "
+        "crispy_forms.template_compiler.Loader."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help="Path of the Python module to write")
+        parser.add_argument(
+            '--template-pack', action='append', dest='template_packs',
+            help="Template pack to compile, by default those in CRISPY_ALLOWED_TEMPLATE_PACKS"
+        )
+        parser.add_argument(
+            '--template', action='append', dest='templates', default=[],
+            help="Name of another template to compile, like a project's own field template"
+        )
+
+    def handle(self, *args, **options):
+        if django.VERSION < (1, 9):
+            raise CommandError("Compiling templates requires Django 1.9 or newer")
+
+        template_packs = options['template_packs'] or crispy_settings.ALLOWED_TEMPLATE_PACKS
+        template_names = []
+        for template_pack in template_packs:
+            template_names += pack_template_names(template_pack)
+        template_names += options['templates']
+
+        engine = Engine.get_default()
+        templates = [(name, engine.get_template(name)) for name in template_names]
+
+        with io.open(options['output'], 'w', encoding='utf-8') as output:
+            output.write(compile_templates(templates))
+
+        self.stdout.write("Compiled %d templates into %s" % (len(templates), options['output']))
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+from weakref import WeakKeyDictionary
+
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.template import Engine
+
+from crispy_forms.compatibility import string_types
+from crispy_forms.layout import Layout, Div, Fieldset
+from crispy_forms.template_cache import get_template
+from crispy_forms.utils import render_field, default_field_template, TEMPLATE_PACK
+
+
+# Render plans are cached per layout instance, keyed by (template_pack, field_template)
+render_plans = WeakKeyDictionary()
+
+# Instructions a `RenderPlan` is made of
+FIELD = 'field'
+OBJECT = 'object'
+OPEN = 'open'
+CLOSE = 'close'
+
+
+def render_method_owner(layout_object):
+    """
+    Returns the class in `layout_object`'s MRO that implements `render`
+    """
+    for klass in type(layout_object).__mro__:
+        if 'render' in vars(klass):
+            return klass
+
+
+class RenderPlan(object):
+    """
+    A `Layout` compiled for a template pack into a flat list of instructions.
+
+    Form fields get their template loaded at compile time. `Layout`, `Div` and `Fieldset`
+    objects (and subclasses not overriding `render`) are unrolled, so that their contents
+    become part of the plan. Any other layout object is rendered calling its `render` method.
+    Rendering a plan is a linear pass over its instructions::
+
+        [
+            (OPEN, None, None),
+            (FIELD, 'email', <field template>),
+            (OBJECT, <HTML object>, None),
+            (CLOSE, <Div object>, <div template>),
+        ]
+    """
+    unrolled_classes = (Layout, Div, Fieldset)
+
+    def __init__(self, layout, template_pack=TEMPLATE_PACK, field_template=None):
+        self.layout = layout
+        self.template_pack = template_pack
+        self.field_template = field_template
+        self.ops = []
+        # Containers unrolled and a copy of their fields when compiled, to detect changes
+        self.structure = []
+
+        if field_template is None:
+            self.default_template = default_field_template(template_pack)
+        else:
+            self.default_template = get_template(field_template)
+
+        self.compile_fields(layout)
+
+    def compile_fields(self, layout_object):
+        self.structure.append((layout_object, list(layout_object.fields)))
+
+        for field in layout_object.fields:
+            if field is None:
+                continue
+
+            if isinstance(field, string_types):
+                self.ops.append((FIELD, field, self.default_template))
+            elif render_method_owner(field) is Layout:
+                self.compile_fields(field)
+            elif render_method_owner(field) in self.unrolled_classes:
+                self.ops.append((OPEN, None, None))
+                self.compile_fields(field)
+                template = get_template(field.get_template_name(self.template_pack))
+                self.ops.append((CLOSE, field, template))
+            else:
+                self.ops.append((OBJECT, field, None))
+
+    def is_stale(self):
+        """
+        Returns True if any of the unrolled containers has changed its fields since compiled
+        """
+        for layout_object, fields in self.structure:
+            if len(layout_object.fields) != len(fields):
+                return True
+            for current, compiled in zip(layout_object.fields, fields):
+                if current is not compiled:
+                    return True
+
+        return False
+
+    def render(self, form, form_style, context):
+        return ''.join(self.iter_render(form, form_style, context))
+
+    def iter_render(self, form, form_style, context):
+        """
+        Renders the plan yielding the html of every top level field and layout object
+        as soon as it's rendered.
+        """
+        template_pack = self.template_pack
+        stack = []
+        output = []
+
+        for op, target, template in self.ops:
+            if op is FIELD:
+                output.append(render_field(
+                    target, form, form_style, context, template=template, template_pack=template_pack
+                ))
+            elif op is OBJECT:
+                output.append(target.render(form, form_style, context, template_pack=template_pack))
+            elif op is OPEN:
+                stack.append(output)
+                output = []
+            else:
+                fields = ''.join(output)
+                output = stack.pop()
+                output.append(target.render_with_fields(fields, form_style, context, template))
+
+            if not stack:
+                for html in output:
+                    yield html
+                output = []
+
+
+def compile_layout(layout, template_pack=TEMPLATE_PACK, field_template=None):
+    """
+    Returns the cached `RenderPlan` of `layout` for `template_pack`, compiling it
+    if it doesn't exist yet or if the layout has changed since compiled. Plans hold
+    loaded templates, so they are compiled every time when the template engine is in
+    debug mode, like `get_template` loads templates every time.
+    """
+    plans = render_plans.setdefault(layout, {})
+    key = (template_pack, field_template)
+
+    plan = plans.get(key)
+    if plan is None or plan.is_stale() or Engine.get_default().debug:
+        plan = plans[key] = RenderPlan(layout, template_pack, field_template)
+
+    return plan
+
+
+def get_render_plan(layout, template_pack=TEMPLATE_PACK, field_template=None):
+    """
+    Returns an up to date `RenderPlan` for `layout` if it has been compiled before,
+    otherwise returns None.
+    """
+    if (template_pack, field_template) not in render_plans.get(layout, ()):
+        return None
+
+    return compile_layout(layout, template_pack, field_template)
+
+
+@receiver(setting_changed)
+def clear_render_plans(**kwargs):
+    # Plans hold loaded templates
+    if kwargs['setting'] in ('TEMPLATES', 'TEMPLATE_DIRS', 'TEMPLATE_LOADERS', 'INSTALLED_APPS'):
+        render_plans.clear()
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""
+Selectors finding layout objects in a layout, like CSS selectors find elements::
+
+    Fieldset > Div Field[name^=addr_]
+
+A selector is a list of compounds, separated by combinators: a space for descendants
+and `>` for children. Selectors separated by commas are all matched. A compound is:
+
+* A type, the name of a layout class or of any of its base classes, `field` for field
+  names, or `*` for anything. Omitting it is the same as `*`.
+* `#name`, matching field names and layout objects named `name`.
+* Attribute conditions: `[attr]`, `[attr=value]`, `[attr^=value]`, `[attr$=value]`,
+  `[attr*=value]` and `[attr~=word]`. Attributes are looked up in the layout object and
+  then in its HTML `attrs`. The `name` of a field name is itself and the names of a
+  `Field` are its field names.
+
+Selectors are compiled once, see `compile_selector`, and matched from right to left,
+starting from the layout objects of the right type found in the layout index.
+"""
+import re
+
+from crispy_forms.compatibility import lru_cache, string_types, text_type
+from crispy_forms.exceptions import DynamicError
+from crispy_forms.layout import Field
+
+
+TOKENS_RE = re.compile(r"""
+    (?P<space>\s+)
+    | (?P<child>>)
+    | (?P<comma>,)
+    | (?P<universal>\*)
+    | (?P<type>[A-Za-z_][\w-]*)
+    | \#(?P<name>[\w-]+)
+    | \[\s*(?P<attr>[A-Za-z_][\w-]*)\s*(?:
+        (?P<op>[~^$*]?=)\s*(?:"(?P<dq>[^"]*)"|'(?P<sq>[^']*)'|(?P<value>[^\]\s'"]+))\s*
+    )?\]
+""", re.VERBOSE)
+
+OPERATORS = {
+    '=': lambda value, expected: value == expected,
+    '^=': lambda value, expected: value.startswith(expected),
+    '$=': lambda value, expected: value.endswith(expected),
+    '*=': lambda value, expected: expected in value,
+    '~=': lambda value, expected: expected in value.split(),
+}
+
+# Type names a layout class matches, by class
+class_type_names = {}
+
+
+def get_type_names(klass):
+    try:
+        return class_type_names[klass]
+    except KeyError:
+        names = set(base.__name__ for base in klass.__mro__)
+        if issubclass(klass, string_types):
+            names.add('field')
+        class_type_names[klass] = names
+        return names
+
+
+def get_attribute_values(layout_object, attr):
+    """
+    Returns the values of `attr` of `layout_object`, as text
+    """
+    if isinstance(layout_object, string_types):
+        return [layout_object] if attr == 'name' else []
+    if attr == 'name' and isinstance(layout_object, Field):
+        return [name for name in layout_object.fields if isinstance(name, string_types)]
+
+    # Layout objects delegate missing attributes to their `fields` list methods
+    value = layout_object.__dict__.get(attr, getattr(layout_object.__class__, attr, None))
+    if value is None or callable(value):
+        value = getattr(layout_object, 'attrs', {}).get(attr)
+    if value is None:
+        return []
+    return [text_type(value)]
+
+
+class Compound(object):
+    """
+    A type and attribute conditions, all matched by the same layout object
+    """
+    def __init__(self):
+        self.type_name = None
+        self.conditions = []
+
+    def matches_class(self, klass):
+        return self.type_name is None or self.type_name in get_type_names(klass)
+
+    def matches_conditions(self, layout_object):
+        for attr, op, expected in self.conditions:
+            values = get_attribute_values(layout_object, attr)
+            if op is None:
+                if not values:
+                    return False
+            elif not any(OPERATORS[op](value, expected) for value in values):
+                return False
+        return True
+
+    def matches(self, layout_object):
+        return self.matches_class(layout_object.__class__) and self.matches_conditions(layout_object)
+
+
+class Selector(object):
+    """
+    A compiled selector. `compounds` are matched by a layout object and its ancestors,
+    from the outermost, with `combinators[i]` relating `compounds[i]` and
+    `compounds[i + 1]`. Each comma separated selector is in `groups`.
+    """
+    def __init__(self, selector):
+        self.selector = selector
+        self.groups = []
+        self.parse(selector)
+
+    def error(self, message):
+        return DynamicError("Invalid selector %r: %s" % (self.selector, message))
+
+    def parse(self, selector):
+        compounds, combinators = [], []
+        compound, combinator = None, None
+        selector = selector.strip()
+        position, end = 0, len(selector)
+        while position < end:
+            match = TOKENS_RE.match(selector, position)
+            if match is None:
+                raise self.error("unexpected %r at position %d" % (selector[position], position))
+            position = match.end()
+            kind = match.lastgroup if match.lastgroup not in ('dq', 'sq', 'value', 'op') else 'attr'
+
+            if kind == 'space':
+                # Spaces around `>` and `,` are not combinators
+                if compound is not None:
+                    compounds.append(compound)
+                    compound, combinator = None, ' '
+                continue
+            if kind in ('child', 'comma'):
+                if compound is not None:
+                    compounds.append(compound)
+                    compound = None
+                elif combinator != ' ':
+                    raise self.error("unexpected %r at position %d" % (match.group(kind), match.start()))
+                combinator = '>' if kind == 'child' else ','
+                continue
+
+            if compound is None:
+                if combinator == ',':
+                    self.groups.append((compounds, combinators))
+                    compounds, combinators = [], []
+                elif compounds:
+                    combinators.append(combinator)
+                compound, combinator = Compound(), None
+
+            if kind in ('type', 'universal'):
+                if compound.type_name is not None or compound.conditions:
+                    raise self.error("unexpected type %r at position %d" % (match.group(kind), match.start()))
+                compound.type_name = match.group('type')
+            elif kind == 'name':
+                compound.conditions.append(('name', '=', match.group('name')))
+            else:
+                op = match.group('op')
+                expected = next((v for v in match.group('dq', 'sq', 'value') if v is not None), None)
+                compound.conditions.append((match.group('attr'), op, expected))
+
+        if compound is None:
+            raise self.error("it can't be empty or end with a combinator")
+        compounds.append(compound)
+        self.groups.append((compounds, combinators))
+
+    def select(self, layout, index):
+        """
+        Returns (path, layout object) pairs of the layout objects within `layout`
+        matching the selector, in layout order. `index` is the `LayoutIndex` of `layout`.
+        """
+        matches = {}
+        layout_objects = {(): layout}
+        classes = list(index.classes) + [layout.__class__]
+        for compounds, combinators in self.groups:
+            # Prunes selectors with types that are not in the layout
+            if not all(any(c.matches_class(klass) for klass in classes) for c in compounds[:-1]):
+                continue
+
+            # Whether `compounds[:i + 1]` are matched within a path, by (i, path)
+            matched = {}
+            subject = compounds[-1]
+            for klass, items in index.classes.items():
+                if not subject.matches_class(klass):
+                    continue
+                for path, layout_object in items:
+                    if path in matches or not subject.matches_conditions(layout_object):
+                        continue
+                    if len(compounds) == 1 or self.match_ancestors(
+                        compounds, combinators, len(compounds) - 2, path[:-1], layout_objects, matched
+                    ):
+                        matches[path] = layout_object
+
+        # Paths are unique, layout objects are never compared
+        return sorted(matches.items())
+
+    def get_object(self, path, layout_objects):
+        try:
+            return layout_objects[path]
+        except KeyError:
+            layout_object = layout_objects[path] = self.get_object(path[:-1], layout_objects).fields[path[-1]]
+            return layout_object
+
+    def match_ancestors(self, compounds, combinators, i, path, layout_objects, matched):
+        """
+        Returns whether `compounds[:i + 1]` are matched by the layout object at `path`, the
+        parent of a layout object matching `compounds[i + 1]`, and its ancestors. With a
+        descendant combinator, `compounds[i]` can be matched by any of them.
+        """
+        key = (i, path)
+        if key in matched:
+            return matched[key]
+
+        result = False
+        while path is not None:
+            if compounds[i].matches(self.get_object(path, layout_objects)) and (
+                i == 0 or self.match_ancestors(compounds, combinators, i - 1, path[:-1] if path else None,
+                                               layout_objects, matched)
+            ):
+                result = True
+                break
+            if combinators[i] == '>' or not path:
+                break
+            path = path[:-1]
+
+        matched[key] = result
+        return result
+
+
+@lru_cache()
+def compile_selector(selector):
+    """
+    Returns the `Selector` of `selector`, parsed once
+    """
+    return Selector(selector)
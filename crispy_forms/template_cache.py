@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+from collections import namedtuple, OrderedDict
+import threading
+from weakref import WeakKeyDictionary
+
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.template import Context, Engine, Template, loader
+from django.utils.safestring import mark_safe
+
+from crispy_forms.compatibility import text_type
+from crispy_forms.conf import crispy_settings
+
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+def get_template_cache_size():
+    return crispy_settings.TEMPLATE_CACHE_SIZE
+
+
+class TemplateCache(object):
+    """
+    Bounded and thread safe cache of compiled `django.template.Template` objects, keyed
+    by template source and template engine. When it's full, the least recently used
+    template is discarded.
+
+    :param maxsize: Number of templates to keep, if None `CRISPY_TEMPLATE_CACHE_SIZE`
+        setting is used.
+    """
+    def __init__(self, maxsize=None):
+        self._maxsize = maxsize
+        self.templates = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @property
+    def maxsize(self):
+        if self._maxsize is None:
+            return get_template_cache_size()
+        return self._maxsize
+
+    def get_template(self, source, engine=None):
+        """
+        Returns a compiled template for `source`, compiling it only if not cached
+        """
+        if engine is None:
+            engine = Engine.get_default()
+        key = (source, engine)
+
+        with self.lock:
+            template = self.templates.pop(key, None)
+            if template is not None:
+                # Reinserting it makes it the most recently used
+                self.templates[key] = template
+                self.hits += 1
+                return template
+            self.misses += 1
+
+        # Compiling happens outside the lock, at worst a template gets compiled twice
+        template = Template(source, engine=engine)
+
+        with self.lock:
+            self.templates[key] = template
+            maxsize = self.maxsize
+            while len(self.templates) > maxsize:
+                self.templates.popitem(last=False)
+
+        return template
+
+    def cache_info(self):
+        with self.lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self.templates))
+
+    def clear(self):
+        with self.lock:
+            self.templates.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+compiled_templates = TemplateCache()
+
+
+def template_from_string(source):
+    """
+    Returns a compiled `Template` for `source` using the default engine. Templates are
+    cached, so that layout objects don't parse the same strings every time they render.
+    """
+    return compiled_templates.get_template(source)
+
+
+# Templates loaded by name of every default template engine, see `get_template`. Engines
+# are replaced when template settings change, their templates go away with them.
+loaded_templates = WeakKeyDictionary()
+
+
+def get_template(template_name):
+    """
+    Cached version of `django.template.loader.get_template`. Template names used by
+    crispy-forms already contain the template pack, like `bootstrap3/field.html`, so
+    every template pack gets its own entries. Templates are cached per default template
+    engine, and not at all when it's in debug mode, so that changes to templates show up
+    while developing like they do with Django's loaders.
+    """
+    engine = Engine.get_default()
+    if engine.debug:
+        return loader.get_template(template_name)
+
+    templates = loaded_templates.get(engine)
+    if templates is None:
+        templates = loaded_templates.setdefault(engine, {})
+    try:
+        return templates[template_name]
+    except KeyError:
+        template = templates[template_name] = loader.get_template(template_name)
+        return template
+
+
+def render_to_string(template_name, context=None):
+    """
+    Like `django.template.loader.render_to_string` but loading the template using `get_template`
+    """
+    return get_template(template_name).render(context)
+
+
+def render_template(template, context, extra_context=None):
+    """
+    Renders a loaded `template` with the variables in `context`, a `Context` or a dictionary,
+    plus `extra_context`. It's the equivalent of `template.render(context.flatten())` but
+    the template gets a new `Context` layered over `context`'s dictionaries instead of a
+    copy of all of them, so the cost doesn't depend on the number of context variables.
+    """
+    # Django >= 1.8 backends wrap a `django.template.Template` which renders a `Context`
+    return getattr(template, 'template', template).render(layered_context(context, extra_context))
+
+
+def layered_context(context, extra_context=None):
+    """
+    Returns the `Context` `render_template` renders templates with. `context`'s dictionaries
+    are shared, so a new one always goes on top of them: tags setting variables, like
+    `{% url ... as name %}`, write there instead of in the caller's `context`.
+    """
+    template_context = Context()
+    if isinstance(context, Context):
+        # Skips builtins, `template_context` has its own
+        template_context.dicts.extend(context.dicts[1:])
+    elif context is not None:
+        template_context.dicts.append(context)
+
+    if extra_context is None:
+        template_context.push()
+    else:
+        template_context.push(extra_context)
+
+    return template_context
+
+
+def static_text(value):
+    """
+    Returns `value` marked safe if it's a string without template syntax, as rendering
+    it as a template would return the same string. Otherwise returns None, also for lazy
+    translations, which need to be evaluated at render time.
+    """
+    if isinstance(value, text_type) and '{{' not in value and '{%' not in value and '{#' not in value:
+        return mark_safe(value)
+    return None
+
+
+class TemplateText(object):
+    """
+    Descriptor for layout object attributes holding text that is rendered as a template.
+    When set, text without template syntax is stored marked safe, as if rendered, and also
+    as `static_<name>`, which is None otherwise. This way layout objects can skip templates
+    altogether::
+
+        class HTML(object):
+            html = TemplateText('html')
+    """
+    def __init__(self, name):
+        self.name = name
+        self.static_name = 'static_%s' % name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        return instance.__dict__[self.name]
+
+    def __set__(self, instance, value):
+        static = static_text(value)
+        instance.__dict__[self.name] = value if static is None else static
+        instance.__dict__[self.static_name] = static
+
+
+@receiver(setting_changed)
+def clear_template_cache(**kwargs):
+    if kwargs['setting'] in ('TEMPLATES', 'TEMPLATE_DIRS', 'TEMPLATE_LOADERS', 'INSTALLED_APPS'):
+        loaded_templates.clear()
+        compiled_templates.clear()
+    elif kwargs['setting'] == 'CRISPY_TEMPLATE_CACHE_SIZE':
+        compiled_templates.clear()
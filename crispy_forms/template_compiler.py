@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+"""
+Compiles Django templates into Python render functions, removing the cost of
+interpreting template nodes when rendering. `compile_crispy_templates` management
+command writes a module with the functions of every template pack template, and
+`Loader` uses them for templates whose source hasn't changed since.
+
+A compiled template is still parsed by Django, its render function uses the parsed
+template's variables and conditions, and renders the nodes it doesn't know how to
+compile, like `{% include %}` or `{% csrf_token %}`, the way Django does.
+"""
+from __future__ import unicode_literals
+import hashlib
+from importlib import import_module
+
+import django
+from django.template import TemplateDoesNotExist, VariableDoesNotExist
+from django.template.base import TextNode, VariableNode
+from django.template.defaulttags import CommentNode, ForNode, IfNode, LoadNode, WithNode
+from django.template.loaders import base
+from django.utils.encoding import force_text
+from django.utils.inspect import func_supports_parameter
+
+from crispy_forms.conf import crispy_settings
+from crispy_forms.templatetags.crispy_forms_utils import SpecialSpacelessNode
+
+
+def source_hash(source):
+    return hashlib.sha1(force_text(source).encode('utf-8')).hexdigest()
+
+
+def child_nodelists(node):
+    """
+    Returns the nodelists of `node` compiled into its parent's render function. Nodes
+    not compiled are rendered by themselves, so their children are not compiled.
+    """
+    if isinstance(node, IfNode):
+        return [nodelist for condition, nodelist in node.conditions_nodelists]
+    if isinstance(node, ForNode) and len(node.loopvars) == 1:
+        return [node.nodelist_loop, node.nodelist_empty]
+    if isinstance(node, (WithNode, SpecialSpacelessNode)):
+        return [node.nodelist]
+    return []
+
+
+def iter_nodes(nodelist):
+    """
+    Yields the nodes of `nodelist` and of their compiled nodelists, in the order their
+    positions in a render function's `nodes` argument are given
+    """
+    for node in nodelist:
+        yield node
+        for child_nodelist in child_nodelists(node):
+            for child in iter_nodes(child_nodelist):
+                yield child
+
+
+def nodes_signature(template):
+    return tuple(node.__class__.__name__ for node in iter_nodes(template.nodelist))
+
+
+def eval_condition(condition, context):
+    # What `IfNode.render` does with each condition
+    try:
+        return condition.eval(context)
+    except VariableDoesNotExist:
+        return None
+
+
+def loop_values(context, resolve_sequence):
+    # What `ForNode.render` does with its sequence
+    try:
+        values = resolve_sequence(context, True)
+    except VariableDoesNotExist:
+        values = []
+    if values is None:
+        values = []
+    if not hasattr(values, '__len__'):
+        values = list(values)
+    return values
+
+
+def loop(context, values, loopvar, is_reversed, parentloop):
+    """
+    Yields once for every item in `values`, with the context ready for rendering the
+    body of a `{% for %}` tag with a single loop variable
+    """
+    len_values = len(values)
+    if is_reversed:
+        values = reversed(values)
+    loop_dict = context['forloop'] = {'parentloop': parentloop}
+    for i, item in enumerate(values):
+        loop_dict['counter0'] = i
+        loop_dict['counter'] = i + 1
+        loop_dict['revcounter'] = len_values - i
+        loop_dict['revcounter0'] = len_values - i - 1
+        loop_dict['first'] = (i == 0)
+        loop_dict['last'] = (i == len_values - 1)
+        context[loopvar] = item
+        yield
+
+
+class TemplateCompiler(object):
+    """
+    Writes the Python source of a function `name(nodes)`, which returns a function
+    rendering `template` given a `Context`. `nodes` are the nodes of `template` as
+    yielded by `iter_nodes`.
+    """
+    def __init__(self, template, name):
+        self.template = template
+        self.name = name
+        self.positions = dict((id(node), i) for i, node in enumerate(iter_nodes(template.nodelist)))
+        self.bindings = []
+        self.lines = []
+        self.text = []
+        self.lists = 0
+
+    def source(self):
+        self.emit_nodelist(self.template.nodelist, 'append', 2)
+
+        lines = ['def %s(nodes):' % self.name]
+        lines += ['    ' + line for line in self.bindings]
+        lines += [
+            '',
+            '    def render(context):',
+            '        html = []',
+            '        append = html.append',
+        ]
+        lines += self.lines
+        lines += [
+            "        return mark_safe(''.join(html))",
+            '',
+            '    return render',
+        ]
+        return '\n'.join(lines) + '\n'
+
+    def emit(self, line, depth):
+        self.lines.append('    ' * depth + line)
+
+    def flush_text(self, append, depth):
+        if self.text:
+            self.emit('%s(%r)' % (append, ''.join(self.text)), depth)
+            self.text = []
+
+    def bind(self, node, name, expression):
+        """
+        Returns the name of a variable set to `expression`, evaluated on `node` once
+        """
+        position = self.positions[id(node)]
+        variable = '%s%d' % (name, position)
+        self.bindings.append('%s = %s' % (variable, expression % ('nodes[%d]' % position)))
+        return variable
+
+    def emit_nodelist(self, nodelist, append, depth):
+        for node in nodelist:
+            if isinstance(node, TextNode):
+                self.text.append(force_text(node.s))
+            elif isinstance(node, (LoadNode, CommentNode)):
+                pass
+            else:
+                self.flush_text(append, depth)
+                self.emit_node(node, append, depth)
+        self.flush_text(append, depth)
+
+    def emit_block(self, nodelist, append, depth):
+        start = len(self.lines)
+        self.emit_nodelist(nodelist, append, depth)
+        if len(self.lines) == start:
+            self.emit('pass', depth)
+
+    def emit_node(self, node, append, depth):
+        if isinstance(node, VariableNode):
+            resolve = self.bind(node, 'variable', '%s.filter_expression.resolve')
+            self.emit('%s(render_value_in_context(%s(context), context))' % (append, resolve), depth)
+
+        elif isinstance(node, IfNode):
+            keyword = 'if'
+            for i, (condition, nodelist) in enumerate(node.conditions_nodelists):
+                if condition is None:
+                    self.emit('else:', depth)
+                else:
+                    name = self.bind(node, 'condition%d_' % i, '%%s.conditions_nodelists[%d][0]' % i)
+                    self.emit('%s eval_condition(%s, context):' % (keyword, name), depth)
+                    keyword = 'elif'
+                self.emit_block(nodelist, append, depth + 1)
+
+        elif isinstance(node, ForNode) and len(node.loopvars) == 1:
+            sequence = self.bind(node, 'sequence', '%s.sequence.resolve')
+            position = self.positions[id(node)]
+            parentloop, values = 'parentloop%d' % position, 'values%d' % position
+            self.emit("%s = context['forloop'] if 'forloop' in context else {}" % parentloop, depth)
+            self.emit('with context.push():', depth)
+            self.emit('%s = loop_values(context, %s)' % (values, sequence), depth + 1)
+            self.emit('if len(%s) < 1:' % values, depth + 1)
+            self.emit_block(node.nodelist_empty, append, depth + 2)
+            self.emit('else:', depth + 1)
+            self.emit('for _ in loop(context, %s, %r, %r, %s):' % (
+                values, node.loopvars[0], node.is_reversed, parentloop
+            ), depth + 2)
+            self.emit_block(node.nodelist_loop, append, depth + 3)
+
+        elif isinstance(node, WithNode):
+            extra_context = self.bind(node, 'extra_context', 'list(%s.extra_context.items())')
+            self.emit(
+                'with context.push(**dict((key, value.resolve(context)) for key, value in %s)):' % extra_context,
+                depth
+            )
+            self.emit_block(node.nodelist, append, depth + 1)
+
+        elif isinstance(node, SpecialSpacelessNode):
+            clean = self.bind(node, 'clean', '%s.clean')
+            self.lists += 1
+            html, inner_append = 'html%d' % self.lists, 'append%d' % self.lists
+            self.emit('%s = []' % html, depth)
+            self.emit('%s = %s.append' % (inner_append, html), depth)
+            self.emit_nodelist(node.nodelist, inner_append, depth)
+            self.emit("%s(force_text(%s(''.join(%s))))" % (append, clean, html), depth)
+
+        else:
+            render = self.bind(node, 'render', 'get_node_render(%s)')
+            self.emit('%s(force_text(%s(context)))' % (append, render), depth)
+
+
+MODULE_HEADER = '''# -*- coding: utf-8 -*-
+# Generated by `compile_crispy_templates` management command, do not edit
+from __future__ import unicode_literals
+
+from django.template import VariableDoesNotExist
+from django.template.base import render_value_in_context
+from django.utils.encoding import force_text
+from django.utils.safestring import mark_safe
+
+from crispy_forms.compatibility import get_node_render
+from crispy_forms.template_compiler import eval_condition, loop, loop_values
+
+DJANGO_VERSION = %r
+'''
+
+
+def compile_templates(templates):
+    """
+    Returns the source of a module with the render functions of `templates`, a list
+    of (template name, `Template`) pairs
+    """
+    chunks = [MODULE_HEADER % django.get_version()]
+    entries = []
+    for i, (template_name, template) in enumerate(templates):
+        name = 'make_render_%d' % i
+        chunks.append('\n' + TemplateCompiler(template, name).source())
+        entries.append('    %r: (%r, %r, %s),' % (
+            template_name, source_hash(template.source), nodes_signature(template), name
+        ))
+    chunks.append('\nTEMPLATES = {\n%s\n}\n' % '\n'.join(entries))
+    return '\n'.join(chunks)
+
+
+def bind_compiled(template, entry):
+    """
+    Makes `template` render using its compiled function if `entry`, a (source hash,
+    nodes signature, function) item of a compiled module, is up to date. Returns
+    whether it does.
+    """
+    hash_, signature, make_render = entry
+    if hash_ != source_hash(template.source) or signature != nodes_signature(template):
+        return False
+    template._render = make_render(list(iter_nodes(template.nodelist)))
+    return True
+
+
+def get_compiled_templates():
+    """
+    Returns the compiled templates of the module in `CRISPY_COMPILED_TEMPLATES` setting
+    """
+    module_name = crispy_settings.COMPILED_TEMPLATES
+    if module_name is None:
+        return {}
+    module = import_module(module_name)
+    if module.DJANGO_VERSION != django.get_version():
+        return {}
+    return module.TEMPLATES
+
+
+class Loader(base.Loader):
+    """
+    Template loader wrapping other loaders. Templates with a compiled render function in
+    `CRISPY_COMPILED_TEMPLATES` module are rendered with it, as long as their source is
+    the one that was compiled. Wrap Django's cached loader, so templates are loaded and
+    checked once::
+
+        'loaders': [
+            ('crispy_forms.template_compiler.Loader', [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ]),
+        ]
+    """
+    def __init__(self, engine, loaders):
+        super(Loader, self).__init__(engine)
+        self.loaders = engine.get_template_loaders(loaders)
+        self._compiled_templates = None
+
+    @property
+    def compiled_templates(self):
+        if self._compiled_templates is None:
+            self._compiled_templates = get_compiled_templates()
+        return self._compiled_templates
+
+    def get_template_sources(self, template_name, template_dirs=None):
+        for loader in self.loaders:
+            args = [template_name]
+            if func_supports_parameter(loader.get_template_sources, 'template_dirs'):
+                args.append(template_dirs)
+            for origin in loader.get_template_sources(*args):
+                yield origin
+
+    def get_contents(self, origin):
+        return origin.loader.get_contents(origin)
+
+    def get_template(self, template_name, template_dirs=None, skip=None):
+        tried = []
+        for loader in self.loaders:
+            try:
+                template = loader.get_template(template_name, template_dirs, skip)
+            except TemplateDoesNotExist as e:
+                tried.extend(e.tried)
+            else:
+                # Templates returned by a cached loader are checked only once
+                if not hasattr(template, 'crispy_compiled'):
+                    entry = self.compiled_templates.get(template_name)
+                    template.crispy_compiled = entry is not None and bind_compiled(template, entry)
+                return template
+        raise TemplateDoesNotExist(template_name, tried=tried)
+
+    def reset(self):
+        for loader in self.loaders:
+            if hasattr(loader, 'reset'):
+                loader.reset()
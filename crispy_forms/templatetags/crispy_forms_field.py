@@ -6,42 +6,85 @@ except ImportError:
 import django
 from django import forms
 from django import template
-from django.template import loader, Context
-from django.conf import settings
+from django.template import Context
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 
-from crispy_forms.utils import TEMPLATE_PACK, get_template_pack
+from crispy_forms.conf import crispy_settings
+from crispy_forms.template_cache import get_template
+from crispy_forms.utils import TEMPLATE_PACK, copy_widget, get_template_pack
 
 register = template.Library()
 
 
+class WidgetKind(object):
+    """
+    What templates need to know about a widget class, computed once per class by
+    `get_widget_kind`. Filters like `is_checkbox` use it, and templates can use it
+    directly through the `widget_kind` filter::
+
+        {% with kind=field|widget_kind %}
+            {% if kind.is_checkbox %}...{% endif %}
+        {% endwith %}
+    """
+    def __init__(self, widget_class):
+        self.is_checkbox = issubclass(widget_class, forms.CheckboxInput)
+        self.is_password = issubclass(widget_class, forms.PasswordInput)
+        self.is_radioselect = issubclass(widget_class, forms.RadioSelect)
+        self.is_select = issubclass(widget_class, forms.Select)
+        self.is_checkboxselectmultiple = issubclass(widget_class, forms.CheckboxSelectMultiple)
+        self.is_file = issubclass(widget_class, forms.ClearableFileInput)
+        self.css_class = widget_class.__name__.lower()
+
+
+# `WidgetKind` of every widget class seen
+widget_kinds = {}
+
+
+def get_widget_kind(widget_class):
+    try:
+        return widget_kinds[widget_class]
+    except KeyError:
+        kind = widget_kinds[widget_class] = WidgetKind(widget_class)
+        return kind
+
+
+@register.filter
+def widget_kind(field):
+    """
+    Returns the `WidgetKind` of a bound field's widget
+    """
+    return get_widget_kind(field.field.widget.__class__)
+
+
 @register.filter
 def is_checkbox(field):
-    return isinstance(field.field.widget, forms.CheckboxInput)
+    return get_widget_kind(field.field.widget.__class__).is_checkbox
 
 
 @register.filter
 def is_password(field):
-    return isinstance(field.field.widget, forms.PasswordInput)
+    return get_widget_kind(field.field.widget.__class__).is_password
 
 
 @register.filter
 def is_radioselect(field):
-    return isinstance(field.field.widget, forms.RadioSelect)
+    return get_widget_kind(field.field.widget.__class__).is_radioselect
 
 
 @register.filter
 def is_select(field):
-    return isinstance(field.field.widget, forms.Select)
+    return get_widget_kind(field.field.widget.__class__).is_select
 
 
 @register.filter
 def is_checkboxselectmultiple(field):
-    return isinstance(field.field.widget, forms.CheckboxSelectMultiple)
+    return get_widget_kind(field.field.widget.__class__).is_checkboxselectmultiple
 
 
 @register.filter
 def is_file(field):
-    return isinstance(field.field.widget, forms.ClearableFileInput)
+    return get_widget_kind(field.field.widget.__class__).is_file
 
 
 @register.filter
@@ -57,7 +100,49 @@ def css_class(field):
     """
     Returns widgets class name in lowercase
     """
-    return field.field.widget.__class__.__name__.lower()
+    return get_widget_kind(field.field.widget.__class__).css_class
+
+
+# CSS classes of widgets, keyed by (widget class, field's widget class, template pack)
+widget_css_classes = {}
+
+
+def get_widget_css_class(widget_class, field_widget_class, template_pack):
+    """
+    Returns the CSS class `{% crispy_field %}` gives widgets of `widget_class`, in a field
+    whose widget is of `field_widget_class`, and whether `form-control` is added to it.
+    Results are cached until `CRISPY_CLASS_CONVERTERS` setting changes.
+    """
+    key = (widget_class, field_widget_class, template_pack)
+    try:
+        return widget_css_classes[key]
+    except KeyError:
+        pass
+
+    converters = {
+        'textinput': 'textinput textInput',
+        'fileinput': 'fileinput fileUpload',
+        'passwordinput': 'textinput textInput',
+    }
+    converters.update(crispy_settings.CLASS_CONVERTERS)
+
+    class_name = widget_class.__name__.lower()
+    class_name = converters.get(class_name, class_name)
+    field_widget_kind = get_widget_kind(field_widget_class)
+    form_control = (
+        template_pack in ['bootstrap3', 'bootstrap4']
+        and not field_widget_kind.is_checkbox
+        and not field_widget_kind.is_file
+    )
+
+    widget_css_classes[key] = class_name, form_control
+    return class_name, form_control
+
+
+@receiver(setting_changed)
+def clear_widget_css_classes(**kwargs):
+    if kwargs['setting'] == 'CRISPY_CLASS_CONVERTERS':
+        widget_css_classes.clear()
 
 
 def pairwise(iterable):
@@ -67,76 +152,68 @@ def pairwise(iterable):
 
 
 class CrispyFieldNode(template.Node):
+    """
+    Renders a field's widget. `field` and `attrs`, a list of (name, value) pairs, are
+    `FilterExpression` objects compiled when parsing the tag, which don't change when
+    rendering, so the node is thread safe.
+    """
     def __init__(self, field, attrs):
         self.field = field
         self.attrs = attrs
-        self.html5_required = 'html5_required'
 
     def render(self, context):
-        # Nodes are not threadsafe so we must store and look up our instance
-        # variables in the current rendering context first
-        if self not in context.render_context:
-            context.render_context[self] = (
-                template.Variable(self.field),
-                self.attrs,
-                template.Variable(self.html5_required)
-            )
-
-        field, attrs, html5_required = context.render_context[self]
-        field = field.resolve(context)
-        try:
-            html5_required = html5_required.resolve(context)
-        except template.VariableDoesNotExist:
-            html5_required = False
-
-        # If template pack has been overridden in FormHelper we can pick it from context
-        template_pack = context.get('template_pack', TEMPLATE_PACK)
-
-        widgets = getattr(field.field.widget, 'widgets', [field.field.widget])
-
-        if isinstance(attrs, dict):
-            attrs = [attrs] * len(widgets)
-
-        converters = {
-            'textinput': 'textinput textInput',
-            'fileinput': 'fileinput fileUpload',
-            'passwordinput': 'textinput textInput',
-        }
-        converters.update(getattr(settings, 'CRISPY_CLASS_CONVERTERS', {}))
-
-        for widget, attr in zip(widgets, attrs):
-            class_name = widget.__class__.__name__.lower()
-            class_name = converters.get(class_name, class_name)
-            css_class = widget.attrs.get('class', '')
-            if css_class:
-                if css_class.find(class_name) == -1:
-                    css_class += " %s" % class_name
-            else:
-                css_class = class_name
-
-            if (
-                template_pack in ['bootstrap3', 'bootstrap4']
-                and not is_checkbox(field)
-                and not is_file(field)
-            ):
-                css_class += ' form-control'
-
-            widget.attrs['class'] = css_class
-
-            # HTML5 required attribute
-            if html5_required and field.field.required and 'required' not in widget.attrs:
-                if field.field.widget.__class__.__name__ is not 'RadioSelect':
-                    widget.attrs['required'] = 'required'
+        field = self.field.resolve(context)
+        attrs = [(name.resolve(context), value.resolve(context)) for name, value in self.attrs]
+        return render_crispy_field(field, context, attrs)
 
-            for attribute_name, attribute in attr.items():
-                attribute_name = template.Variable(attribute_name).resolve(context)
 
-                if attribute_name in widget.attrs:
-                    widget.attrs[attribute_name] += " " + template.Variable(attribute).resolve(context)
-                else:
-                    widget.attrs[attribute_name] = template.Variable(attribute).resolve(context)
+def render_crispy_field(field, context, attrs=()):
+    """
+    Returns the html of `{% crispy_field field %}`, `attrs` being the tag's resolved
+    (name, value) pairs
+    """
+    html5_required = context.get('html5_required', False)
+
+    # If template pack has been overridden in FormHelper we can pick it from context
+    template_pack = context.get('template_pack', TEMPLATE_PACK)
+
+    # The field is rendered with a copy of its widget, so that it's left untouched
+    widget = copy_widget(field.field.widget)
+    widgets = getattr(widget, 'widgets', [widget])
+
+    field_widget_class = field.field.widget.__class__
+    for subwidget in widgets:
+        class_name, form_control = get_widget_css_class(
+            subwidget.__class__, field_widget_class, template_pack
+        )
+        css_class = subwidget.attrs.get('class', '')
+        if css_class:
+            if css_class.find(class_name) == -1:
+                css_class += " %s" % class_name
+        else:
+            css_class = class_name
+
+        if form_control:
+            css_class += ' form-control'
+
+        subwidget.attrs['class'] = css_class
+
+        # HTML5 required attribute
+        if html5_required and field.field.required and 'required' not in subwidget.attrs:
+            if field.field.widget.__class__.__name__ is not 'RadioSelect':
+                subwidget.attrs['required'] = 'required'
+
+        for attribute_name, attribute in attrs:
+            if attribute_name in subwidget.attrs:
+                subwidget.attrs[attribute_name] += " " + attribute
+            else:
+                subwidget.attrs[attribute_name] = attribute
 
-        return field
+    # What `str(field)` does, but with the widget copy
+    html = field.as_widget(widget=widget)
+    if field.field.show_hidden_initial:
+        html += field.as_hidden(only_initial=True)
+    return html
 
 
 @register.tag(name="crispy_field")
@@ -145,13 +222,14 @@ def crispy_field(parser, token):
     {% crispy_field field attrs %}
     """
     token = token.split_contents()
-    field = token.pop(1)
-    attrs = {}
+    field = parser.compile_filter(token.pop(1))
 
     # We need to pop tag name, or pairwise would fail
     token.pop(0)
-    for attribute_name, value in pairwise(token):
-        attrs[attribute_name] = value
+    attrs = [
+        (parser.compile_filter(attribute_name), parser.compile_filter(value))
+        for attribute_name, value in pairwise(token)
+    ]
 
     return CrispyFieldNode(field, attrs)
 
@@ -174,7 +252,7 @@ def crispy_addon(field, append="", prepend="", form_show_labels=True):
             'form_show_errors': True,
             'form_show_labels': form_show_labels,
         })
-        template = loader.get_template('%s/layout/prepended_appended_text.html' % get_template_pack())
+        template = get_template('%s/layout/prepended_appended_text.html' % get_template_pack())
         context['crispy_prepended_text'] = prepend
         context['crispy_appended_text'] = append
 
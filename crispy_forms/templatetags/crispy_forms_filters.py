@@ -4,21 +4,18 @@ from django.conf import settings
 from django.forms import forms
 from django.forms.formsets import BaseFormSet
 from django.template import Context
-from django.template.loader import get_template
 from django.utils.safestring import mark_safe
 from django import template
 
-from crispy_forms.compatibility import lru_cache
 from crispy_forms.exceptions import CrispyError
+from crispy_forms.template_cache import get_template
 from crispy_forms.utils import flatatt, TEMPLATE_PACK
 
 
-@lru_cache()
 def uni_formset_template(template_pack=TEMPLATE_PACK):
     return get_template('%s/uni_formset.html' % template_pack)
 
 
-@lru_cache()
 def uni_form_template(template_pack=TEMPLATE_PACK):
     return get_template('%s/uni_form.html' % template_pack)
 
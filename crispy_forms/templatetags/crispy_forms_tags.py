@@ -1,22 +1,27 @@
 # -*- coding: utf-8 -*-
 from copy import copy
+import re
+import threading
+from uuid import uuid4
 
 import django
-from django.conf import settings
+from django.db import close_old_connections
 from django.forms.formsets import BaseFormSet
 from django.template import Context
-from django.template.loader import get_template
 from django import template
+from django.utils.safestring import mark_safe
 
 from crispy_forms.helper import FormHelper
-from crispy_forms.compatibility import lru_cache, string_types
+from crispy_forms.compatibility import string_types, ThreadPoolExecutor
+from crispy_forms.conf import crispy_settings
+from crispy_forms.template_cache import get_template
+from crispy_forms.templatetags.crispy_forms_utils import holdback_start, SpacelessStream
+from crispy_forms.utils import TEMPLATE_PACK, carry_request_state, get_template_pack
 
 register = template.Library()
 # We import the filters, so they are available when doing load crispy_forms_tags
 from crispy_forms.templatetags.crispy_forms_filters import *
 
-from crispy_forms.utils import TEMPLATE_PACK, get_template_pack
-
 
 class ForLoopSimulator(object):
     """
@@ -84,16 +89,12 @@ class BasicNode(template.Node):
             self.helper = None
         self.template_pack = template_pack or get_template_pack()
 
-    def get_render(self, context):
+    def resolve_form_and_helper(self, context):
         """
-        Returns a `Context` object with all the necessary stuff for rendering the form
-
-        :param context: `django.template.Context` variable holding the context for the node
-
-        `self.form` and `self.helper` are resolved into real Python objects resolving them
-        from the `context`. The `actual_form` can be a form or a formset. If it's a formset
-        `is_formset` is set to True. If the helper has a layout we use it, for rendering the
-        form or the formset's forms.
+        Resolves `self.form` and `self.helper` from the `context`, returning the form or
+        formset, the helper used and the template pack, also set as `self.actual_helper`
+        and `self.template_pack`. Nodes are shared by threads rendering the same template,
+        so code rendering after this call uses the returned values, not the attributes.
         """
         # Nodes are not thread safe in multithreaded environments
         # https://docs.djangoproject.com/en/dev/howto/custom-template-tags/#thread-safety-considerations
@@ -113,30 +114,58 @@ class BasicNode(template.Node):
             helper = FormHelper() if not hasattr(actual_form, 'helper') else actual_form.helper
 
         # use template_pack from helper, if defined
+        template_pack = self.template_pack
         try:
             if helper.template_pack:
-                self.template_pack = helper.template_pack
+                template_pack = self.template_pack = helper.template_pack
         except AttributeError:
             pass
 
         self.actual_helper = helper
+        return actual_form, helper, template_pack
+
+    def get_render(self, context, render_layout=None):
+        """
+        Returns a `Context` object with all the necessary stuff for rendering the form
+
+        :param context: `django.template.Context` variable holding the context for the node
+        :param render_layout: Optional function called with every form and its context
+            instead of the helper's `render_layout`, returning the form's layout html.
+
+        `self.form` and `self.helper` are resolved into real Python objects resolving them
+        from the `context`. The `actual_form` can be a form or a formset. If it's a formset
+        `is_formset` is set to True. If the helper has a layout we use it, for rendering the
+        form or the formset's forms.
+        """
+        actual_form, helper, template_pack = self.resolve_form_and_helper(context)
+        return self.get_resolved_render(context, actual_form, helper, template_pack, render_layout)
 
+    def get_resolved_render(self, context, actual_form, helper, template_pack, render_layout=None):
+        """
+        Does what `get_render` does, with the form or formset, helper and template pack
+        returned by `resolve_form_and_helper`
+        """
         # We get the response dictionary
         is_formset = isinstance(actual_form, BaseFormSet)
-        response_dict = self.get_response_dict(helper, context, is_formset)
+        response_dict = self.get_response_dict(helper, context, is_formset, template_pack)
         node_context = copy_context(context)
         node_context.update(response_dict)
 
+        if render_layout is None:
+            def render_layout(form, form_context):
+                return helper.render_layout(form, form_context, template_pack=template_pack)
+
         # If we have a helper's layout we use it, for the form or the formset's forms
         if helper and helper.layout:
             if not is_formset:
-                actual_form.form_html = helper.render_layout(actual_form, node_context, template_pack=self.template_pack)
+                actual_form.form_html = render_layout(actual_form, node_context)
             else:
                 forloop = ForLoopSimulator(actual_form)
                 helper.render_hidden_fields = True
                 for form in actual_form:
-                    node_context.update({'forloop': forloop})
-                    form.form_html = helper.render_layout(form, node_context, template_pack=self.template_pack)
+                    # A copy per form, as `render_layout` could keep the context for later
+                    node_context.update({'forloop': copy(forloop)})
+                    form.form_html = render_layout(form, node_context)
                     forloop.iterate()
 
         if is_formset:
@@ -146,24 +175,27 @@ class BasicNode(template.Node):
 
         return Context(response_dict)
 
-    def get_response_dict(self, helper, context, is_formset):
+    def get_response_dict(self, helper, context, is_formset, template_pack=None):
         """
         Returns a dictionary with all the parameters necessary to render the form/formset in a template.
 
         :param context: `django.template.Context` for the node
         :param is_formset: Boolean value. If set to True, indicates we are working with a formset.
+        :param template_pack: Template pack resolved for this render, by default `self.template_pack`
         """
         if not isinstance(helper, FormHelper):
             raise TypeError('helper object provided to {% crispy %} tag must be a crispy.helper.FormHelper object.')
 
-        attrs = helper.get_attributes(template_pack=self.template_pack)
+        if template_pack is None:
+            template_pack = self.template_pack
+        attrs = helper.get_attributes(template_pack=template_pack)
         form_type = "form"
         if is_formset:
             form_type = "formset"
 
         # We take form/formset parameters from attrs if they are set, otherwise we use defaults
         response_dict = {
-            'template_pack': self.template_pack,
+            'template_pack': template_pack,
             '%s_action' % form_type: attrs['attrs'].get("action", ''),
             '%s_method' % form_type: attrs.get("form_method", 'post'),
             '%s_tag' % form_type: attrs.get("form_tag", True),
@@ -199,33 +231,208 @@ class BasicNode(template.Node):
         return response_dict
 
 
-@lru_cache()
 def whole_uni_formset_template(template_pack=TEMPLATE_PACK):
     return get_template('%s/whole_uni_formset.html' % template_pack)
 
 
-@lru_cache()
 def whole_uni_form_template(template_pack=TEMPLATE_PACK):
     return get_template('%s/whole_uni_form.html' % template_pack)
 
 
-class CrispyFormNode(BasicNode):
-    def render(self, context):
-        c = self.get_render(context)
+# Stands for the layout html of a form when streaming, see `CrispyFormNode.iter_render`.
+# `specialspaceless` strips the `\x1c` whitespace around it only if there is nothing else
+# around the layout within its block, and changes the `/><` in it into `/> <`.
+LAYOUT_PLACEHOLDER = '\x1c\x00%s-%d/><\x00\x1c'
+LAYOUT_PLACEHOLDER_RE = r'(\x1c?)\x00%s-(\d+)(/> ?<)\x00(\x1c?)'
+
 
-        if self.actual_helper is not None and getattr(self.actual_helper, 'template', False):
-            template = get_template(self.actual_helper.template)
+def close_spaceless(stream, text, strip):
+    """
+    Closes `stream` once the `specialspaceless` block it belongs to is left behind, feeding
+    it the beginning of `text`, up to where it could be part of a match. Returns the output
+    and the rest of `text`.
+    """
+    if strip:
+        return stream.close(strip=True), text
+    end = len(text) - len(text.lstrip()) + 2
+    return stream.feed(text[:end]) + stream.close(), text[end:]
+
+
+# Thread pool rendering formsets' forms in parallel, shared by every render, so that the
+# number of threads stays bounded. It's created with `CRISPY_RENDER_WORKERS` threads, or
+# the workers of the first render needing it if more, see `get_render_executor`.
+render_executor = None
+render_executor_lock = threading.Lock()
+# Tells pool threads apart, so that formsets within layouts are rendered in the same thread
+render_thread = threading.local()
+
+
+def get_render_workers(helper):
+    """
+    Returns the number of threads rendering the layouts of formsets' forms with `helper`
+    """
+    workers = getattr(helper, 'render_workers', None)
+    if workers is None:
+        workers = crispy_settings.RENDER_WORKERS
+    return workers
+
+
+def get_render_executor(workers):
+    global render_executor
+    with render_executor_lock:
+        if render_executor is None:
+            render_executor = ThreadPoolExecutor(max(workers, crispy_settings.RENDER_WORKERS))
+        return render_executor
+
+
+def split_layouts(layouts, workers):
+    """
+    Splits `layouts` into at most `workers` consecutive chunks of about the same size
+    """
+    size = -(-len(layouts) // workers) or 1
+    return [layouts[i:i + size] for i in range(0, len(layouts), size)]
+
+
+class CrispyFormNode(BasicNode):
+    def get_form_template(self, c, helper=None):
+        if helper is None:
+            helper = self.actual_helper
+        template_pack = c.get('template_pack', self.template_pack)
+        if helper is not None and getattr(helper, 'template', False):
+            return get_template(helper.template)
+        elif c['is_formset']:
+            return whole_uni_formset_template(template_pack)
         else:
-            if c['is_formset']:
-                template = whole_uni_formset_template(self.template_pack)
-            else:
-                template = whole_uni_form_template(self.template_pack)
+            return whole_uni_form_template(template_pack)
+
+    def render(self, context):
+        actual_form, helper, template_pack = self.resolve_form_and_helper(context)
+        workers = get_render_workers(helper)
+        if (
+            workers > 1 and ThreadPoolExecutor is not None
+            and isinstance(actual_form, BaseFormSet)
+            and not getattr(render_thread, 'pooled', False)
+        ):
+            return self.render_parallel(context, workers)
+
+        c = self.get_resolved_render(context, actual_form, helper, template_pack)
+        template = self.get_form_template(c, helper)
 
         if django.VERSION >= (1, 8):
             c = c.flatten()
 
         return template.render(c)
 
+    def render_placeholders(self, context):
+        """
+        Renders the form or formset template with a placeholder where every form's layout
+        goes. Returns the output split around placeholders, see `LAYOUT_PLACEHOLDER_RE`,
+        the list of forms to render, with their contexts, in placeholder order, and the
+        helper and template pack to render them with.
+        """
+        token = uuid4().hex
+        layouts = []
+
+        def defer_layout(form, form_context):
+            layouts.append((form, copy_context(form_context)))
+            return mark_safe(LAYOUT_PLACEHOLDER % (token, len(layouts) - 1))
+
+        actual_form, helper, template_pack = self.resolve_form_and_helper(context)
+        c = self.get_resolved_render(context, actual_form, helper, template_pack, render_layout=defer_layout)
+        template = self.get_form_template(c, helper)
+
+        if django.VERSION >= (1, 8):
+            c = c.flatten()
+
+        parts = re.split(LAYOUT_PLACEHOLDER_RE % token, template.render(c))
+        return parts, layouts, helper, template_pack
+
+    def render_parallel(self, context, workers):
+        """
+        Renders like `render`, but the layouts of the formset's forms are rendered
+        concurrently by up to `workers` threads of the shared pool, each with its own
+        context and the calling thread's language, URLconf and script prefix. Pool threads
+        close their expired database connections after rendering, like requests do.
+        """
+        parts, layouts, helper, template_pack = self.render_placeholders(context)
+
+        @carry_request_state
+        def render_layouts(chunk):
+            render_thread.pooled = True
+            try:
+                return [
+                    [helper.render_layout(form, form_context, template_pack=template_pack)]
+                    for form, form_context in chunk
+                ]
+            finally:
+                close_old_connections()
+
+        rendered_layouts = []
+        chunks = split_layouts(layouts, workers)
+        for rendered_chunk in get_render_executor(workers).map(render_layouts, chunks):
+            rendered_layouts.extend(rendered_chunk)
+        return mark_safe(''.join(self.splice_layouts(parts, rendered_layouts)))
+
+    def iter_render(self, context):
+        """
+        Renders like `render`, but yielding the html in chunks. The form or formset template
+        is rendered first using `render_placeholders`. Then layouts are rendered one top level
+        field or layout object at a time and yielded in place of their placeholders.
+        """
+        parts, layouts, helper, template_pack = self.render_placeholders(context)
+        rendered_layouts = [
+            helper.iter_layout(form, form_context, template_pack=template_pack)
+            for form, form_context in layouts
+        ]
+
+        for html in self.splice_layouts(parts, rendered_layouts):
+            if html:
+                yield html
+
+    def splice_layouts(self, parts, rendered_layouts):
+        """
+        Joins the output of `render_placeholders` and the html chunks of every rendered layout.
+        Text within `specialspaceless` blocks goes through `SpacelessStream`, so that the result
+        is the same `render` returns.
+        """
+        stream = strip_end = None
+
+        for i in range(0, len(parts) - 1, 5):
+            text, lead, index, probe, trail = parts[i:i + 5]
+            spaceless = probe != '/><'
+
+            if stream is not None and not strip_end and spaceless and lead:
+                # Both layouts are within the same `specialspaceless` block
+                yield stream.feed(text)
+            else:
+                if stream is not None:
+                    html, text = close_spaceless(stream, text, strip_end)
+                    yield html
+                    stream = None
+                if spaceless:
+                    stream = SpacelessStream()
+                    cut = holdback_start(text) if lead else len(text)
+                    yield text[:cut]
+                    yield stream.feed(text[cut:])
+                else:
+                    yield text
+
+            strip_start = spaceless and not lead
+            strip_end = spaceless and not trail
+            for html in rendered_layouts[int(index)]:
+                if stream is not None:
+                    if strip_start:
+                        html = html.lstrip()
+                        strip_start = not html
+                    html = stream.feed(html)
+                yield html
+
+        text = parts[-1]
+        if stream is not None:
+            html, text = close_spaceless(stream, text, strip_end)
+            yield html
+        yield text
+
 
 # {% crispy %} tag
 @register.tag(name="crispy")
@@ -279,11 +486,7 @@ def do_uni_form(parser, token):
 
     if template_pack is not None:
         template_pack = template_pack[1:-1]
-        ALLOWED_TEMPLATE_PACKS = getattr(
-            settings,
-            'CRISPY_ALLOWED_TEMPLATE_PACKS',
-            ('bootstrap', 'uni_form', 'bootstrap3', 'bootstrap4')
-        )
+        ALLOWED_TEMPLATE_PACKS = crispy_settings.ALLOWED_TEMPLATE_PACKS
         if template_pack not in ALLOWED_TEMPLATE_PACKS:
             raise template.TemplateSyntaxError(
                 "crispy tag's template_pack argument should be in %s" %
@@ -2,29 +2,144 @@
 import re
 
 from django import template
+from django.template.base import TextNode
 from django.utils.encoding import force_text
 from django.utils.functional import allow_lazy
 
-from crispy_forms.compatibility import text_type
+from crispy_forms.compatibility import get_node_render, text_type
 
 
 register = template.Library()
 
 
+# Both `remove_spaces` replacements in one pass: `>` followed by 3 or more whitespace
+# characters and `<`, or `/>` followed by `<`, become `> <` and `/> <`. They can't overlap,
+# so doing them at once has the same result as doing them one after the other. Starting
+# with a literal `>` lets the regex engine jump from one `>` to the next.
+SPACES_RE = re.compile(r'>(?:\s{3,}|(?<=/>))<')
+
+
+def remove_text_spaces(html):
+    """
+    `remove_spaces` for a string, without lazy evaluation support
+    """
+    return SPACES_RE.sub('> <', html)
+
+
 def remove_spaces(value):
-    html = re.sub(r'>\s{3,}<', '> <', force_text(value))
-    return re.sub(r'/><', r'/> <', force_text(html))
+    return remove_text_spaces(force_text(value))
 
 
 remove_spaces = allow_lazy(remove_spaces, text_type)
 
 
+def split_spaceless_text(text):
+    """
+    Splits `text` at its first and last `<` returning (head, middle, tail), with
+    `remove_spaces` already applied to middle. None if there is no middle.
+
+    Both `remove_spaces` patterns end with their only `<`, so no match goes past a `<`
+    and `remove_spaces` can be applied to the text on each side of one separately. This
+    way the middle of template text is cleaned once, while head and tail are cleaned with
+    whatever is rendered around them.
+    """
+    start = text.find('<') + 1
+    end = text.rfind('<') + 1
+    if start == end:
+        return None
+    return text[:start], remove_text_spaces(text[start:end]), text[end:]
+
+
+def rstrip_end(text):
+    """
+    Returns `len(text.rstrip())`, without copying `text`
+    """
+    end = len(text)
+    while end and text[end - 1].isspace():
+        end -= 1
+    return end
+
+
+def holdback_start(text):
+    """
+    Returns the position where the end of `text` that could take part in a `remove_spaces`
+    match with text coming after it starts: trailing whitespace, preceded by `>`, `/>` or `/`.
+    """
+    end = rstrip_end(text)
+    if text.endswith('/>', 0, end):
+        return end - 2
+    if text.endswith('>', 0, end) or text.endswith('/', 0, end):
+        return end - 1
+    return end
+
+
+class SpacelessStream(object):
+    """
+    Applies `remove_spaces` to text fed in chunks, with the same output as applying it
+    to all the text at once. The end of every chunk that could match with the next one
+    is held back until more text is fed or the stream is closed. Every chunk is scanned
+    once, on its own, so there is no need to join them first.
+
+    :param strip: Whether to remove leading whitespace, from as many chunks as needed.
+    """
+    def __init__(self, strip=False):
+        self.pending = ''
+        self.strip = strip
+
+    def feed(self, text):
+        if self.strip:
+            text = text.lstrip()
+            self.strip = not text
+        if self.pending:
+            text = self.pending + text
+        cut = holdback_start(text)
+        if cut == len(text):
+            self.pending = ''
+        else:
+            self.pending = text[cut:]
+            text = text[:cut]
+        return remove_text_spaces(text)
+
+    def close(self, strip=False):
+        """
+        Returns what is left, with trailing whitespace removed if `strip` is True
+        """
+        text = self.pending.rstrip() if strip else self.pending
+        self.pending = ''
+        return remove_text_spaces(text)
+
+
 class SpecialSpacelessNode(template.Node):
+    """
+    Renders its nodes with `remove_spaces` applied to the output, without its leading and
+    trailing whitespace. Template text is split by `split_spaceless_text` when parsing,
+    so that only what is rendered around it goes through `remove_spaces` every time, and
+    the output of each node goes through a `SpacelessStream` as it's rendered.
+    """
     def __init__(self, nodelist):
         self.nodelist = nodelist
+        self.text_parts = [
+            split_spaceless_text(node.s) if isinstance(node, TextNode) else None
+            for node in nodelist
+        ]
 
     def render(self, context):
-        return remove_spaces(self.nodelist.render(context).strip())
+        stream = SpacelessStream(strip=True)
+        html = []
+        for node, text_parts in zip(self.nodelist, self.text_parts):
+            if text_parts is None:
+                html.append(stream.feed(force_text(get_node_render(node)(context))))
+            else:
+                # `head` ends with `<`, so nothing is held back after feeding it
+                head, middle, tail = text_parts
+                html.append(stream.feed(head))
+                html.append(middle)
+                html.append(stream.feed(tail))
+        html.append(stream.close(strip=True))
+        return ''.join(html)
+
+    def clean(self, html):
+        return remove_spaces(html.strip())
 
 
 @register.tag
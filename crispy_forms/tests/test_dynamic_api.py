@@ -8,7 +8,7 @@ from crispy_forms.compatibility import string_types
 from crispy_forms.exceptions import DynamicError
 from crispy_forms.helper import FormHelper, FormHelpersException
 from crispy_forms.layout import (
-    Layout, Fieldset, MultiField, HTML, Div, Field
+    Layout, Fieldset, MultiField, HTML, Div, Field, Row
 )
 from crispy_forms.bootstrap import AppendedText
 from crispy_forms.tests.forms import TestForm
@@ -244,6 +244,205 @@ def test_get_layout_objects():
     ]
 
 
+def test_iter_layout_objects():
+    layout = Layout(
+        Div(
+            Div('email'),
+            'password1',
+        ),
+        'password2',
+    )
+    assert [
+        (path, getattr(layout_object, 'fields', layout_object))
+        for path, layout_object in layout.iter_layout_objects(greedy=True)
+    ] == [
+        ((0,), layout[0].fields),
+        ((0, 0), ['email']),
+        ((0, 0, 0), 'email'),
+        ((0, 1), 'password1'),
+        ((1,), 'password2'),
+    ]
+    assert [path for path, layout_object in layout.iter_layout_objects(max_level=1)] == [
+        (0,), (0, 0), (0, 1), (1,)
+    ]
+
+    # Deeper than Python's recursion limit
+    deep_layout = Layout('field')
+    for i in range(2000):
+        deep_layout = Layout(deep_layout)
+    assert deep_layout.get_field_names() == [[[0] * 2001, 'field']]
+
+
+def test_layout_index():
+    helper = FormHelper()
+    helper.layout = Layout(
+        Div('email', Row('password1')),
+        'password2',
+    )
+    index = helper.layout.get_layout_index()
+    assert helper.layout.get_layout_index() is index
+    assert index.names == {'email': [(0, 0)], 'password1': [(0, 1, 0)], 'password2': [(1,)]}
+    assert helper.filter(Div, max_level=1).slice == [[[0], 'div'], [[0, 1], 'row']]
+
+    # Changing the fields of any layout object builds the index again
+    helper.layout[0].append(Div('first_name'))
+    assert helper.layout.get_layout_index() is not index
+    assert helper['first_name'].slice == [[[0, 2, 0], 'first_name']]
+
+    helper['email'].wrap(Field)
+    helper['password2'].wrap(Div)
+    assert helper['email'].slice == [[[0, 0, 0], 'email']]
+    assert helper.filter(string_types, Div, max_level=1).slice == [
+        [[0], 'div'], [[0, 1], 'row'], [[0, 2], 'div'], [[1], 'div'], [[1, 0], 'str']
+    ]
+    assert helper.filter(string_types, Div, max_level=1).slice == helper.layout.get_layout_objects(
+        string_types, Div, max_level=1
+    )
+
+
+def test_layout_index_fields_changed_directly():
+    helper = FormHelper()
+    helper.layout = Layout(Div('email'), 'password1')
+    other_layout = Layout('password2')
+    index = helper.layout.get_layout_index()
+
+    # Other layouts changing don't build the index again
+    other_layout.append('first_name')
+    assert helper.layout.get_layout_index() is index
+    assert helper.layout.get_layout_index(check_fields=True) is index
+
+    # Changes made to fields lists directly are noticed only when checking fields
+    helper.layout.fields.append('last_name')
+    assert helper.layout.get_layout_index() is index
+    assert helper.layout.get_layout_index(check_fields=True) is not index
+    assert helper['last_name'].slice == [[[2], 'last_name']]
+    helper.layout[0].fields.insert(0, 'first_name')
+    helper.layout.get_layout_index(check_fields=True)
+    assert helper.select('Div > *').slice == [[[0, 0], 'first_name'], [[0, 1], 'email']]
+    helper.layout[0].fields = ['password2']
+    helper.layout.get_layout_index(check_fields=True)
+    assert helper['email'].slice == []
+    assert helper['password2'].slice == [[[0, 0], 'password2']]
+
+
+def test_layout_index_shared_layout_objects():
+    div = Div('email')
+    layout = Layout(div, 'password1')
+    other_layout = Layout(Fieldset('Other', div))
+    index, other_index = layout.get_layout_index(), other_layout.get_layout_index()
+
+    # A layout object within several layouts marks all their indexes as stale
+    div.append('password2')
+    assert index.stale and other_index.stale
+    assert layout.get_layout_index().names['password2'] == [(0, 1)]
+    assert other_layout.get_layout_index().names['password2'] == [(0, 0, 1)]
+
+
+def test_batch():
+    helper = FormHelper()
+    helper.layout = Layout(
+        Div('email', 'password1'),
+        'password2',
+    )
+    index = helper.layout.get_layout_index()
+    with helper.batch() as batch:
+        batch['email'].wrap(Field, css_class='email')
+        batch['password2'].wrap(Div, css_class='password')
+        batch.filter(Div).map(lambda div: setattr(div, 'css_id', 'box'))
+        batch[0:2].wrap_together(Fieldset, 'legend')
+        # Nothing changes until the batch is over, lookups see the layout as it was
+        assert helper.layout[0][0] == 'email'
+        assert batch.filter(Div, greedy=True).slice == [[[0], 'div']]
+        assert helper.layout.get_layout_index() is index
+
+    fieldset = helper.layout[0]
+    assert len(helper.layout) == 1
+    assert fieldset.legend == 'legend'
+    assert fieldset[0][0].attrs == {'class': 'email'}
+    assert fieldset[1].css_class == 'password'
+    assert fieldset[0].css_id == 'box'
+    assert helper['password1'].slice == [[[0, 0, 1], 'password1']]
+
+    # Operations are not applied if there is an exception
+    with pytest.raises(ZeroDivisionError):
+        with helper.batch() as batch:
+            batch['password1'].wrap(Field)
+            1 / 0
+    assert helper.layout[0][0][1] == 'password1'
+
+
+def test_batch_wrap_twice():
+    helper = FormHelper()
+    helper.layout = Layout(Div('email', 'password1'))
+    helper['email'].wrap(Field, css_class='first')
+    helper['email'].wrap(Field, css_class='second')
+
+    batch_helper = FormHelper()
+    batch_helper.layout = Layout(Div('email', 'password1'))
+    with batch_helper.batch() as batch:
+        batch['email'].wrap(Field, css_class='first')
+        batch['email'].wrap(Field, css_class='second')
+
+    # The same as wrapping it twice outside of a batch
+    assert batch_helper.layout.get_layout_objects(Field, greedy=True) == [[[0, 0], 'field'], [[0, 0, 0], 'field']]
+    assert batch_helper.layout[0][0].attrs == helper.layout[0][0].attrs == {'class': 'first'}
+    assert batch_helper.layout[0][0][0].attrs == helper.layout[0][0][0].attrs == {'class': 'second'}
+    assert batch_helper.layout[0][0][0][0] == 'email'
+    assert batch_helper.layout[0][1] == 'password1'
+
+
+def test_batch_lookups_use_starting_layout():
+    helper = FormHelper()
+    helper.layout = Layout(Div(Field('email', css_class='old'), 'password1'))
+    with helper.batch() as batch:
+        batch['password1'].wrap(Field, css_class='new')
+        # Only the Field that was in the layout when the batch started is found
+        batch.filter(Field, greedy=True).update_attributes(placeholder='found')
+        assert batch.filter(Field, greedy=True).slice == [[[0, 0], 'field']]
+
+    assert helper.layout[0][0].attrs == {'class': 'old', 'placeholder': 'found'}
+    assert helper.layout[0][1].attrs == {'class': 'new'}
+    # Once the batch is over, lookups see its changes
+    assert helper.filter(Field, greedy=True).slice == [[[0, 0], 'field'], [[0, 1], 'field']]
+
+
+def test_select():
+    helper = FormHelper()
+    helper.layout = Layout(
+        Fieldset(
+            'Address',
+            Div(Field('addr_1', css_class='wide input'), 'addr_2', Row('city')),
+            'addr_3',
+        ),
+        Div(Field('addr_4'), 'email'),
+    )
+
+    assert helper.select('Fieldset > Div Field[name^=addr_]').slice == [[[0, 0, 0], 'field']]
+    assert helper.select('Fieldset field').slice == [
+        [[0, 0, 0, 0], 'addr_1'], [[0, 0, 1], 'addr_2'], [[0, 0, 2, 0], 'city'], [[0, 1], 'addr_3'],
+    ]
+    assert helper.select('Fieldset > field').slice == [[[0, 1], 'addr_3']]
+    # Types match subclasses, `Row` is a `Div`
+    assert helper.select('Layout > Div').slice == [[[1], 'div']]
+    assert helper.select('Div').slice == [[[0, 0], 'div'], [[0, 0, 2], 'row'], [[1], 'div']]
+    assert helper.select('Row field, #email').slice == [[[0, 0, 2, 0], 'city'], [[1, 1], 'email']]
+    assert helper.select('Field[class~=input]').slice == [[[0, 0, 0], 'field']]
+    assert helper.select('Fieldset[legend$="ress"] * > field').slice == [
+        [[0, 0, 0, 0], 'addr_1'], [[0, 0, 1], 'addr_2'], [[0, 0, 2, 0], 'city'],
+    ]
+    assert helper.select('Fieldset Fieldset').slice == []
+
+    helper.select('Row > field').wrap(Field, css_class='city')
+    assert helper.layout[0][0][2][0].attrs == {'class': 'city'}
+    with helper.batch() as batch:
+        batch.select('Layout > Div > field').wrap(Div)
+    assert helper.layout[1][1].fields == ['email']
+
+    for selector in ['', 'Div >', '> Div', 'Div > > field', 'Div [name', 'Div*']:
+        with pytest.raises(DynamicError):
+            helper.select(selector)
+
+
 def test_filter_and_wrap():
     helper = FormHelper()
     layout = Layout(
@@ -275,8 +474,19 @@ def test_filter_and_wrap_side_effects():
         ),
     )
     helper.layout = layout
+
+    # Wrapping a div doesn't get in the way of wrapping the divs within it
+    helper.filter(Div, max_level=2).wrap(Div, css_class="test-class")
+    assert layout[0].css_class == "test-class"
+    assert layout[0][0][0] == 'extra_field'
+    assert layout[0][0][1].css_class == "test-class"
+    assert layout[0][0][1][0][0] == 'password1'
+
+    # Layout objects no longer in the layout can't be wrapped
+    password_slice = helper['password1']
+    del layout[0][0][1][0][0]
     with pytest.raises(DynamicError):
-        helper.filter(Div, max_level=2).wrap(Div, css_class="test-class")
+        password_slice.wrap(Field)
 
 
 def test_get_field_names():
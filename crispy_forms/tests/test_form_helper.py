@@ -2,10 +2,11 @@
 from __future__ import unicode_literals
 
 import re
+import threading
 
 import django
 from django import forms
-from django.core.urlresolvers import reverse
+from django.core.urlresolvers import clear_url_caches, reverse, set_script_prefix
 from django.forms.models import formset_factory
 from django.middleware.csrf import _get_new_csrf_key
 from django.template import (
@@ -14,6 +15,7 @@ from django.template import (
 
 import pytest
 
+from django.utils import translation
 from django.utils.translation import ugettext_lazy as _
 
 from .compatibility import get_template_from_string
@@ -24,11 +26,13 @@ from crispy_forms.bootstrap import (
     StrictButton
 )
 from crispy_forms.compatibility import text_type
+from crispy_forms import helper as helper_module
 from crispy_forms.helper import FormHelper, FormHelpersException
 from crispy_forms.layout import (
-    Layout, Submit, Reset, Hidden, Button, MultiField, Field
+    Layout, Submit, Reset, Hidden, Button, MultiField, Field, Div, Fieldset, HTML
 )
-from crispy_forms.utils import render_crispy_form
+from crispy_forms.render_plan import FIELD, OBJECT, OPEN, CLOSE, get_render_plan
+from crispy_forms.utils import iter_crispy_form, render_crispy_form
 from crispy_forms.templatetags.crispy_forms_tags import CrispyFormNode
 
 
@@ -278,6 +282,73 @@ def test_template_context_using_form_attrs():
     assert context['form_attrs']['action'] == "submit/test/form"
 
 
+def test_get_attributes_is_cached():
+    helper = FormHelper()
+    helper.form_id = 'test-form'
+    attributes = helper.get_attributes('bootstrap3')
+    assert helper.get_attributes('bootstrap3') == attributes
+    assert helper.get_attributes('uni_form')['attrs']['class'] == ' uniForm'
+
+    # Setting an attribute, or changing `attrs` in place, invalidates the cache
+    helper.form_id = 'other-form'
+    assert helper.get_attributes('bootstrap3')['attrs']['id'] == 'other-form'
+    helper.attrs['autocomplete'] = 'off'
+    assert 'autocomplete="off"' in helper.get_attributes('bootstrap3')['flat_attrs']
+    helper.add_input(Submit('submit', 'Submit'))
+    assert helper.get_attributes('bootstrap3')['inputs'] == helper.inputs
+
+
+def test_get_attributes_with_class_attributes_and_properties():
+    class CustomHelper(FormHelper):
+        form_class = 'first'
+
+        @property
+        def form_method(self):
+            return self.method
+
+    helper = CustomHelper()
+    helper.method = 'GET'
+    assert helper.get_attributes('bootstrap3')['attrs']['class'] == 'first'
+
+    CustomHelper.form_class = 'second'
+    helper.__dict__['method'] = 'POST'
+    attributes = helper.get_attributes('bootstrap3')
+    assert attributes['attrs']['class'] == 'second'
+    assert attributes['form_method'] == 'POST'
+
+
+def test_form_action_is_reversed_once(monkeypatch):
+    reversed_names = []
+
+    def counting_reverse(viewname):
+        reversed_names.append(viewname)
+        return reverse(viewname)
+
+    monkeypatch.setattr(helper_module, 'reverse', counting_reverse)
+    clear_url_caches()
+    helper = FormHelper()
+    helper.form_action = 'simpleAction'
+    assert helper.form_action == helper.form_action == '/simple/action/'
+    assert FormHelper().form_action == ''
+
+    # Paths aren't reversed at all, anything else that can't be reversed is used as is
+    helper.form_action = '/submit/test/form'
+    assert helper.form_action == '/submit/test/form'
+    helper.form_action = 'submit/test/form'
+    assert helper.form_action == helper.form_action == 'submit/test/form'
+    assert reversed_names == ['simpleAction', 'submit/test/form']
+
+    # URLs are reversed per language
+    helper.form_action = 'simpleAction'
+    with translation.override('de'):
+        assert helper.form_action == helper.form_action == '/simple/action/'
+    assert reversed_names == ['simpleAction', 'submit/test/form', 'simpleAction']
+
+    clear_url_caches()
+    assert helper.form_action == '/simple/action/'
+    assert reversed_names == ['simpleAction', 'submit/test/form', 'simpleAction', 'simpleAction']
+
+
 def test_template_helper_access():
     helper = FormHelper()
     helper.form_id = 'test-form'
@@ -718,3 +789,226 @@ def test_bootstrap4_template_pack():
     html = render_crispy_form(form)
     assert 'form-control' not in html
     assert 'ctrlHolder' in html
+
+
+def test_compiled_layout_renders_the_same(settings, advanced_layout):
+    helper = FormHelper()
+    helper.layout = advanced_layout
+    html = render_crispy_form(TestForm(), helper)
+
+    helper.compile(settings.CRISPY_TEMPLATE_PACK)
+    assert render_crispy_form(TestForm(), helper) == html
+
+
+def test_compile_unrolls_layout(settings):
+    helper = FormHelper()
+    helper.layout = Layout(
+        Div('email', Layout('password1')),
+        Fieldset('legend', 'password2'),
+        HTML('extra text'),
+        None,
+    )
+    plan = helper.compile(settings.CRISPY_TEMPLATE_PACK)
+
+    assert [op for op, target, template in plan.ops] == [
+        OPEN, FIELD, FIELD, CLOSE, OPEN, FIELD, CLOSE, OBJECT
+    ]
+    assert plan.ops[1][1] == 'email'
+    assert plan.ops[2][1] == 'password1'
+    assert plan.ops[3][1] is helper.layout[0]
+    assert plan.ops[-1][1] is helper.layout[2]
+
+
+def test_compiled_plan_is_cached(settings):
+    settings.TEMPLATES = [dict(settings.TEMPLATES[0], OPTIONS={'debug': False})]
+    helper = FormHelper()
+    helper.layout = Layout(Div('email'), 'password1')
+    plan = helper.compile(settings.CRISPY_TEMPLATE_PACK)
+    assert helper.compile(settings.CRISPY_TEMPLATE_PACK) is plan
+
+    helper.field_template = 'bootstrap/field.html'
+    assert helper.compile(settings.CRISPY_TEMPLATE_PACK) is not plan
+
+
+def test_compiled_plan_is_compiled_again_in_debug(settings):
+    settings.TEMPLATES = [dict(settings.TEMPLATES[0], OPTIONS={'debug': True})]
+    helper = FormHelper()
+    helper.layout = Layout(Div('email'), 'password1')
+    plan = helper.compile(settings.CRISPY_TEMPLATE_PACK)
+    assert helper.compile(settings.CRISPY_TEMPLATE_PACK) is not plan
+    assert get_render_plan(helper.layout, settings.CRISPY_TEMPLATE_PACK) is not plan
+
+
+def test_compiled_plan_follows_layout_changes(settings):
+    form = TestForm()
+    form.helper = FormHelper()
+    form.helper.layout = Layout(Div('email'))
+    form.helper.compile(settings.CRISPY_TEMPLATE_PACK)
+
+    form.helper.layout[0].append('password1')
+    html = render_crispy_form(form)
+    assert 'id="id_email"' in html
+    assert 'id="id_password1"' in html
+
+
+def test_render_layout_flattens_context_once(settings):
+    class CountingContext(Context):
+        flattened = 0
+
+        def flatten(self):
+            CountingContext.flattened += 1
+            return super(CountingContext, self).flatten()
+
+    helper = FormHelper()
+    helper.layout = Layout(
+        Div('email', Field('password1', css_class='special')),
+        Fieldset('legend {{ foo }}', 'password2'),
+        Submit('save', 'save {{ foo }}'),
+        'first_name',
+    )
+    context = CountingContext({
+        'foo': 'bar', 'form_show_errors': True, 'form_show_labels': True
+    })
+    html = helper.render_layout(TestForm(), context, settings.CRISPY_TEMPLATE_PACK)
+
+    assert CountingContext.flattened == 1
+    assert 'legend bar' in html
+    assert 'value="save bar"' in html
+    assert html.count('requiredField') == 4
+    # Per field variables don't leak into the context
+    assert 'field' not in context
+    assert 'flat_attrs' not in context
+
+
+@pytest.mark.parametrize('helper_attrs', [
+    {},
+    {'form_tag': False},
+    {'form_tag': False, 'disable_csrf': True, 'form_show_errors': False},
+    {'form_tag': False, 'disable_csrf': True, 'form_show_errors': False, 'inputs': []},
+    {'form_method': 'GET', 'form_action': 'simpleAction', 'form_id': 'this-form-rocks'},
+])
+def test_iter_crispy_form_renders_the_same(advanced_layout, helper_attrs):
+    def get_form():
+        form = TestForm({'email': 'invalidemail', 'password1': 'yes'})
+        form.helper = FormHelper()
+        form.helper.layout = advanced_layout
+        form.helper.add_input(Submit('submit', 'Submit'))
+        for attr, value in helper_attrs.items():
+            setattr(form.helper, attr, value)
+        return form
+
+    chunks = list(iter_crispy_form(get_form(), context={'csrf_token': 'token'}))
+    assert len(chunks) > 2
+    assert ''.join(chunks) == render_crispy_form(get_form(), context={'csrf_token': 'token'})
+
+
+def test_iter_crispy_form_formset(settings):
+    TestFormSet = formset_factory(TestForm, extra=3)
+    helper = FormHelper()
+    helper.layout = Layout(Fieldset('Item {{ forloop.counter }}', 'email'), 'password1')
+    helper.compile(settings.CRISPY_TEMPLATE_PACK)
+
+    chunks = list(iter_crispy_form(TestFormSet(), helper))
+    html = ''.join(chunks)
+    assert len(chunks) > 6
+    assert html == render_crispy_form(TestFormSet(), helper)
+    assert html.count('Item 1') == html.count('Item 3') == 1
+
+
+def test_iter_crispy_form_without_layout():
+    TestFormSet = formset_factory(TestForm, extra=2)
+    assert ''.join(iter_crispy_form(TestForm())) == render_crispy_form(TestForm())
+    assert ''.join(iter_crispy_form(TestFormSet())) == render_crispy_form(TestFormSet())
+
+
+@only_bootstrap
+def test_iter_crispy_form_template_without_layouts(settings):
+    TestFormSet = formset_factory(TestForm, extra=2)
+    helper = FormHelper()
+    helper.template = '%s/table_inline_formset.html' % settings.CRISPY_TEMPLATE_PACK
+    helper.layout = Layout(Field('email', css_class='special'))
+
+    html = ''.join(iter_crispy_form(TestFormSet(), helper))
+    assert html == render_crispy_form(TestFormSet(), helper)
+
+
+def test_formset_render_workers(settings):
+    class ThreadHTML(HTML):
+        threads = set()
+
+        def render(self, form, form_style, context, template_pack=None, **kwargs):
+            self.threads.add(threading.current_thread())
+            return super(ThreadHTML, self).render(form, form_style, context, template_pack)
+
+    TestFormSet = formset_factory(TestForm, extra=6)
+    helper = FormHelper()
+    helper.layout = Layout(
+        Fieldset('Item {{ forloop.counter }}', 'email', ThreadHTML('{{ forloop.counter0 }}')),
+        'password1'
+    )
+    html = render_crispy_form(TestFormSet(), helper)
+    assert ThreadHTML.threads == set([threading.current_thread()])
+
+    helper.render_workers = 3
+    ThreadHTML.threads.clear()
+    assert render_crispy_form(TestFormSet(), helper) == html
+    assert threading.current_thread() not in ThreadHTML.threads
+
+    helper.render_workers = None
+    settings.CRISPY_RENDER_WORKERS = 3
+    ThreadHTML.threads.clear()
+    assert render_crispy_form(TestFormSet(), helper) == html
+    assert threading.current_thread() not in ThreadHTML.threads
+
+
+def test_formset_render_workers_request_state():
+    TestFormSet = formset_factory(TestForm, extra=3)
+    helper = FormHelper()
+    helper.layout = Layout(
+        Fieldset(_('Password'), 'password1'),
+        HTML('<a href="{% url "simpleAction" %}"></a>')
+    )
+
+    set_script_prefix('/prefix/')
+    try:
+        with translation.override('de'):
+            html = render_crispy_form(TestFormSet(), helper)
+            helper.render_workers = 3
+            assert render_crispy_form(TestFormSet(), helper) == html
+    finally:
+        set_script_prefix('/')
+
+    assert html.count('Passwort') == 3
+    assert html.count('/prefix/simple/action/') == 3
+
+
+def test_formset_render_workers_pool(monkeypatch):
+    from crispy_forms.templatetags import crispy_forms_tags
+
+    class ThreadHTML(HTML):
+        threads = set()
+
+        def render(self, form, form_style, context, template_pack=None, **kwargs):
+            self.threads.add(threading.current_thread())
+            return super(ThreadHTML, self).render(form, form_style, context, template_pack)
+
+    closed = []
+    monkeypatch.setattr(crispy_forms_tags, 'close_old_connections', lambda: closed.append(True))
+    monkeypatch.setattr(crispy_forms_tags, 'render_executor', None)
+
+    TestFormSet = formset_factory(TestForm, extra=6)
+    helper = FormHelper()
+    helper.layout = Layout('email', ThreadHTML('{{ forloop.counter0 }}'))
+    html = render_crispy_form(TestFormSet(), helper)
+
+    helper.render_workers = 4
+    assert render_crispy_form(TestFormSet(), helper) == html
+    executor = crispy_forms_tags.render_executor
+    assert closed
+
+    # Renders asking for other numbers of workers share the pool, using up to their workers
+    helper.render_workers = 2
+    ThreadHTML.threads.clear()
+    assert render_crispy_form(TestFormSet(), helper) == html
+    assert crispy_forms_tags.render_executor is executor
+    assert len(ThreadHTML.threads) <= 2
@@ -7,7 +7,7 @@ from django.forms.models import formset_factory, modelformset_factory
 from django.middleware.csrf import _get_new_csrf_key
 from django.shortcuts import render_to_response
 from django.template import (
-    Context, RequestContext
+    Context, RequestContext, Template
 )
 import pytest
 
@@ -27,6 +27,7 @@ from crispy_forms.layout import (
     Layout, Fieldset, MultiField, Row, Column, HTML, ButtonHolder,
     Div, Submit
 )
+from crispy_forms.templatetags.crispy_forms_utils import remove_spaces, SpacelessStream
 from crispy_forms.utils import render_crispy_form
 
 
@@ -413,6 +414,32 @@ def test_specialspaceless_not_screwing_intended_spaces():
     assert '<span>first span</span> <span>second span</span>' in html
 
 
+@pytest.mark.parametrize('value', ['', '   <br/>', '<p/>  \n  ', '>   <', 'text/'])
+def test_specialspaceless_template_text(value):
+    source = """
+        <div>   <input/><span>{{ value|safe }}</span>
+            <input type="text"/>{{ value|safe }}<br/>
+        </div>   {{ value|safe }}
+    """
+    template = Template('{% load crispy_forms_utils %}{% specialspaceless %}' + source + '{% endspecialspaceless %}')
+
+    # Same as removing spaces from the whole output
+    html = remove_spaces(Template(source).render(Context({'value': value})).strip())
+    assert template.render(Context({'value': value})) == html
+
+
+def test_spaceless_stream():
+    html = '  <div>   <input/><br/>\n   <p>text  </p> <span/>   \t\n</div>  '
+    assert remove_spaces(html) == '  <div> <input/> <br/> <p>text  </p> <span/> </div>  '
+
+    # Fed in chunks of any size, the result is the same as removing spaces at once
+    for size in range(1, len(html) + 1):
+        stream = SpacelessStream(strip=True)
+        chunks = [stream.feed(html[i:i + size]) for i in range(0, len(html), size)]
+        chunks.append(stream.close(strip=True))
+        assert ''.join(chunks) == remove_spaces(html.strip())
+
+
 @only_uni_form
 def test_layout_composition():
     form_helper = FormHelper()
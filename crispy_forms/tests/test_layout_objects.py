@@ -1,14 +1,16 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
+import threading
 
 from django import forms
 from django.template import Context
 
-from django.utils.translation import ugettext as _
+from django.utils.safestring import SafeData
+from django.utils.translation import ugettext as _, ugettext_lazy
 from django.utils.translation import activate, deactivate
 
 from .compatibility import get_template_from_string
-from .conftest import only_bootstrap
+from .conftest import only_bootstrap, only_uni_form
 from .forms import CheckboxesTestForm, TestForm
 from crispy_forms.bootstrap import (
     PrependedAppendedText, AppendedText, PrependedText, InlineRadios,
@@ -17,8 +19,9 @@ from crispy_forms.bootstrap import (
 )
 from crispy_forms.helper import FormHelper
 from crispy_forms.layout import (
-    Layout, HTML, Field, MultiWidgetField
+    Layout, HTML, Field, MultiField, MultiWidgetField, Fieldset, Submit
 )
+from crispy_forms.template_cache import compiled_templates
 from crispy_forms.utils import render_crispy_form
 
 
@@ -135,6 +138,89 @@ def test_i18n():
     deactivate()
 
 
+def test_static_text_skips_templates():
+    compiled_templates.clear()
+    html = HTML('<p>Static & safe</p>')
+    fieldset = Fieldset('Legend & more', 'email')
+    submit = Submit('save', 'Save & continue')
+
+    assert html.render(None, None, Context()) == '<p>Static & safe</p>'
+    assert isinstance(html.render(None, None, Context()), SafeData)
+    assert fieldset.static_legend == 'Legend & more'
+    assert submit.static_value == 'Save & continue'
+
+    test_form = TestForm()
+    test_form.helper = FormHelper()
+    test_form.helper.layout = Layout(html, fieldset, submit)
+    rendered = render_crispy_form(test_form)
+    assert '<legend>Legend & more</legend>' in rendered
+    assert 'value="Save & continue"' in rendered
+    assert compiled_templates.cache_info().misses == 0
+
+
+def test_dynamic_text_keeps_using_templates():
+    html = HTML('{{ foo }}')
+    assert html.static_html is None
+    assert html.render(None, None, Context({'foo': 'bar'})) == 'bar'
+
+    html.html = 'static now'
+    assert html.render(None, None, Context({'foo': 'bar'})) == 'static now'
+
+    html.html = '{% if foo %}foo{% endif %}'
+    assert html.render(None, None, Context({'foo': 'bar'})) == 'foo'
+
+    # Lazy translations are evaluated every time they are rendered
+    fieldset = Fieldset(ugettext_lazy('Enter a valid value.'))
+    assert fieldset.static_legend is None
+
+
+@only_uni_form
+def test_rendering_does_not_change_layout():
+    submit = Submit('save', 'save {{ counter }}')
+    multifield = MultiField('legend', 'email', 'password1')
+    layout = Layout(multifield, submit)
+
+    def render(form):
+        form.helper = FormHelper()
+        form.helper.layout = layout
+        return render_crispy_form(form, context={'counter': 1})
+
+    html = render(TestForm({'email': 'invalidemail', 'password1': 'yes'}))
+    assert 'value="save 1"' in html
+    assert 'ctrlHolder error' in html
+    assert render(TestForm({'email': 'invalidemail', 'password1': 'yes'})) == html
+
+    assert submit.value == 'save {{ counter }}'
+    assert multifield.css_class == 'ctrlHolder'
+    assert not hasattr(multifield, 'bound_fields')
+
+
+def test_layout_shared_by_threads():
+    helper = FormHelper()
+    helper.layout = Layout(
+        Fieldset('legend {{ counter }}', 'email'),
+        Submit('save', 'save {{ counter }}'),
+    )
+    outputs = {}
+
+    def render(counter):
+        for i in range(10):
+            html = render_crispy_form(TestForm(), helper, context={'counter': counter})
+            outputs.setdefault(counter, set()).add(html)
+
+    threads = [threading.Thread(target=render, args=(counter,)) for counter in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for counter, htmls in outputs.items():
+        assert len(htmls) == 1
+        html = htmls.pop()
+        assert 'legend %s' % counter in html
+        assert 'value="save %s"' % counter in html
+
+
 @only_bootstrap
 class TestBootstrapLayoutObjects(object):
 
@@ -340,6 +426,23 @@ class TestBootstrapLayoutObjects(object):
         assert html.count('name="password1"') == 1
         assert html.count('name="password2"') == 1
 
+    def test_tab_holder_with_other_layout_objects(self):
+        class TabLike(object):
+            def render(self, form, form_style, context, template_pack=None):
+                return '<p>tab like</p>'
+
+            def render_link(self, template_pack=None, **kwargs):
+                return '<li>tab like</li>'
+
+        test_form = TestForm()
+        test_form.helper = FormHelper()
+        test_form.helper.layout = Layout(TabHolder(Tab('one', 'first_name'), TabLike()))
+        html = render_crispy_form(test_form)
+
+        assert html.count('class="tab-pane active"') == 2
+        assert html.count('<p>tab like</p>') == 1
+        assert html.count('<li>tab like</li>') == 1
+
     def test_tab_helper_reuse(self):
         # this is a proper form, according to the docs.
         # note that the helper is a class property here,
@@ -373,6 +476,31 @@ class TestBootstrapLayoutObjects(object):
         # tab 2 should be active
         assert html.count('<div id="two" \n    class="tab-pane active') == 1
 
+    def test_containers_are_not_changed(self):
+        tab_holder = TabHolder(Tab('one', 'first_name'), Tab('two', 'password1'))
+        accordion = Accordion(
+            AccordionGroup('three', 'last_name'), AccordionGroup('four', 'password2')
+        )
+        button = StrictButton('go {{ counter }}')
+
+        def render(data=None):
+            form = TestForm(data)
+            form.helper = FormHelper()
+            form.helper.layout = Layout(tab_holder, accordion, button)
+            return render_crispy_form(form, context={'counter': 1})
+
+        html = render()
+        render({'first_name': 'too long name', 'password2': 'yes'})
+        assert render() == html
+        assert 'go 1' in html
+
+        assert [tab.active for tab in tab_holder] == [False, False]
+        assert [tab.css_class for tab in tab_holder] == ['tab-pane', 'tab-pane']
+        assert [group.active for group in accordion] == [False, False]
+        assert accordion[0].data_parent == ''
+        assert accordion.css_id.startswith('accordion-')
+        assert button.content == 'go {{ counter }}'
+
     def test_radio_attrs(self):
         form = CheckboxesTestForm()
         form.fields['inline_radios'].widget.attrs = {'class': "first"}
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+from django import forms
 from django.forms.forms import BoundField
 from django.forms.models import formset_factory
 from django.template import Context
@@ -9,8 +10,10 @@ import pytest
 
 from .compatibility import get_template_from_string
 from .conftest import only_bootstrap
-from .forms import TestForm
-from crispy_forms.templatetags.crispy_forms_field import crispy_addon
+from .forms import CheckboxesTestForm, TestForm
+from crispy_forms.templatetags.crispy_forms_field import (
+    crispy_addon, get_widget_kind, widget_css_classes, widget_kinds
+)
 from crispy_forms.exceptions import CrispyError
 
 
@@ -173,6 +176,72 @@ def test_crispy_field_and_class_converters():
     assert 'inputtext' in html
 
 
+def test_widget_kind():
+    template = get_template_from_string("""
+        {% load crispy_forms_field %}
+        {% with kind=field|widget_kind %}{{ kind.css_class }} {{ kind.is_select }} {{ kind.is_checkbox }}{% endwith %}
+        {{ field|is_checkbox }}
+    """)
+    test_form = CheckboxesTestForm()
+    bound_field = BoundField(test_form, test_form.fields['checkboxes'], 'checkboxes')
+
+    html = template.render(Context({'field': bound_field}))
+    assert 'checkboxselectmultiple True False' in html
+    assert html.strip().endswith('False')
+    assert get_widget_kind(forms.CheckboxSelectMultiple) is widget_kinds[forms.CheckboxSelectMultiple]
+    assert get_widget_kind(forms.PasswordInput).is_password
+
+
+def test_crispy_field_attribute_expressions():
+    template = get_template_from_string("""
+        {% load crispy_forms_field %}
+        {% crispy_field testField 'placeholder' label|upper 'class' css %}
+    """)
+    test_form = TestForm()
+    bound_field = BoundField(test_form, test_form.fields['email'], 'email')
+
+    html = template.render(Context({'testField': bound_field, 'label': 'email', 'css': 'big'}))
+    assert 'placeholder="EMAIL"' in html
+    assert 'big' in html
+
+    html = template.render(Context({'testField': bound_field, 'label': 'mail', 'css': 'small'}))
+    assert 'placeholder="MAIL"' in html
+    assert 'small' in html
+    assert 'big' not in html
+
+
+def test_crispy_field_class_converters_setting(settings):
+    template = get_template_from_string("""
+        {% load crispy_forms_field %}
+        {% crispy_field testField %}
+    """)
+    test_form = TestForm()
+    bound_field = BoundField(test_form, test_form.fields['email'], 'email')
+
+    html = template.render(Context({'testField': bound_field}))
+    assert 'textinput textInput' in html
+    assert widget_css_classes
+
+    settings.CRISPY_CLASS_CONVERTERS = {'textinput': 'custom-input'}
+    html = template.render(Context({'testField': bound_field}))
+    assert 'textinput' not in html
+    assert 'custom-input' in html
+
+
+def test_crispy_field_does_not_change_widget():
+    template = get_template_from_string("""
+        {% load crispy_forms_field %}
+        {% crispy_field testField 'class' 'error' %}
+    """)
+    test_form = TestForm()
+    bound_field = BoundField(test_form, test_form.fields['email'], 'email')
+    attrs = dict(test_form.fields['email'].widget.attrs)
+
+    html = template.render(Context({'testField': bound_field}))
+    assert template.render(Context({'testField': bound_field})) == html
+    assert test_form.fields['email'].widget.attrs == attrs
+
+
 @only_bootstrap
 def test_crispy_addon(settings):
     test_form = TestForm()
@@ -1,6 +1,30 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
-from crispy_forms.utils import list_union, list_difference, list_intersection, set_hidden, render_field
+import sys
+
+import django
+from django.core.management import call_command
+from django.core.urlresolvers import set_script_prefix
+from django.forms.models import formset_factory
+from django.template import Context, Engine, Template
+from django.utils import translation
+from django.utils.six import StringIO
+from django.utils.translation import ugettext_lazy
+
+import pytest
+
+from crispy_forms.conf import crispy_settings
+from crispy_forms.field_renderers import get_field_renderer, loaded_field_renderers
+from crispy_forms.layout import Field, Fieldset, HTML, Layout, MultiWidgetField
+from crispy_forms.helper import FormHelper
+from crispy_forms.template_cache import (
+    TemplateCache, compiled_templates, get_template, loaded_templates, render_template
+)
+from crispy_forms.template_compiler import bind_compiled, compile_templates
+from crispy_forms.tests.forms import CheckboxesTestForm, TestForm
+from crispy_forms.utils import (
+    list_union, list_difference, list_intersection, set_hidden, render_field, render_crispy_form
+)
 
 
 def test_list_intersection():
@@ -37,3 +61,262 @@ def test_set_hidden():
 def test_render_field_with_none_field():
     rendered = render_field(field=None, form=None, form_style=None, context=None)
     assert rendered == ''
+
+
+@pytest.mark.parametrize('helper_attrs', [
+    {},
+    {'html5_required': True, 'form_show_labels': False},
+    {'help_text_inline': True, 'form_show_errors': False},
+    {'form_class': 'form-horizontal', 'label_class': 'col-lg-2', 'field_class': 'col-lg-8'},
+])
+def test_native_field_rendering(settings, helper_attrs):
+    form = TestForm({'email': 'invalid', 'password1': 'yes', 'first_name': 'too long'})
+    form.helper = FormHelper()
+    form.helper.layout = Layout(
+        'is_company', 'email', 'password1', 'password2',
+        Field('first_name', css_class='special', wrapper_class='wrapper'),
+        Field('last_name', type='hidden'),
+        'datetime_field',
+    )
+    for attribute, value in helper_attrs.items():
+        setattr(form.helper, attribute, value)
+    checkboxes_form = CheckboxesTestForm()
+
+    settings.CRISPY_NATIVE_FIELD_RENDERING = False
+    html = render_crispy_form(form)
+    checkboxes_html = render_crispy_form(checkboxes_form)
+
+    settings.CRISPY_NATIVE_FIELD_RENDERING = True
+    assert render_crispy_form(form) == html
+    assert render_crispy_form(checkboxes_form) == checkboxes_html
+
+
+def test_get_field_renderer():
+    assert get_field_renderer(get_template('uni_form/field.html')) is not None
+    assert get_field_renderer(get_template('bootstrap3/field.html')) is not None
+    assert get_field_renderer(get_template('custom_field_template.html')) is None
+    assert get_field_renderer(Template('{{ field }}')) is None
+
+
+@pytest.mark.parametrize('debug', [True, False])
+def test_field_renderers_are_not_kept(settings, debug):
+    settings.TEMPLATES = [dict(settings.TEMPLATES[0], OPTIONS={'debug': debug})]
+    settings.CRISPY_NATIVE_FIELD_RENDERING = True
+    form = TestForm()
+    form.helper = FormHelper()
+    form.helper.layout = Layout('email', 'password1')
+
+    html = render_crispy_form(form)
+    size = len(loaded_field_renderers)
+    assert render_crispy_form(form) == html
+    assert len(loaded_field_renderers) == size
+    assert size == (0 if debug else 1)
+
+
+def test_render_field_does_not_change_form(settings):
+    form = TestForm()
+    form.helper = FormHelper()
+    form.helper.layout = Layout(
+        Field('email', css_class='special', data_name='foo'),
+        Field('password1', type='hidden'),
+        MultiWidgetField('datetime_field', attrs=({'rel': 'date'}, {'rel': 'time'})),
+    )
+    email_widget = form.fields['email'].widget
+    email_attrs = dict(email_widget.attrs)
+    password_widget = form.fields['password1'].widget
+
+    html = render_crispy_form(form)
+    assert 'special' in html
+    assert 'data-name="foo"' in html
+    assert 'type="hidden"' in html
+    assert 'rel="time"' in html
+    assert render_crispy_form(form) == html
+
+    assert form.fields['email'].widget is email_widget
+    assert email_widget.attrs == email_attrs
+    assert form.fields['password1'].widget is password_widget
+    assert not password_widget.is_hidden
+    assert [widget.attrs for widget in form.fields['datetime_field'].widget.widgets] == [{}, {}]
+
+
+def test_render_template_does_not_change_context():
+    template = Template('{% url "simpleAction" as action %}{{ foo }} {{ action }}')
+    context = Context({'foo': 'bar'})
+    assert render_template(template, context) == 'bar /simple/action/'
+    assert 'action' not in context
+
+    context = {'foo': 'bar'}
+    assert render_template(template, context) == 'bar /simple/action/'
+    assert context == {'foo': 'bar'}
+
+
+def test_template_cache_hits_and_misses():
+    cache = TemplateCache(maxsize=2)
+    template = cache.get_template('{{ foo }}')
+    assert cache.get_template('{{ foo }}') is template
+    assert cache.cache_info() == (1, 1, 2, 1)
+    assert template.render(Context({'foo': 'bar'})) == 'bar'
+
+
+def test_template_cache_discards_least_recently_used():
+    cache = TemplateCache(maxsize=2)
+    first = cache.get_template('first')
+    cache.get_template('second')
+    cache.get_template('first')
+    cache.get_template('third')
+
+    assert cache.cache_info().currsize == 2
+    assert cache.get_template('first') is first
+    assert cache.cache_info().misses == 3
+    cache.get_template('second')
+    assert cache.cache_info().misses == 4
+
+
+def test_template_cache_size_setting(settings):
+    settings.CRISPY_TEMPLATE_CACHE_SIZE = 1
+    cache = TemplateCache()
+    cache.get_template('first')
+    cache.get_template('second')
+    assert cache.cache_info() == (0, 2, 1, 1)
+
+
+def test_crispy_settings(settings):
+    settings.CRISPY_FAIL_SILENTLY = False
+    assert crispy_settings.FAIL_SILENTLY is False
+    settings.CRISPY_FAIL_SILENTLY = True
+    assert crispy_settings.FAIL_SILENTLY is True
+
+    settings.CRISPY_CLASS_CONVERTERS = {'textinput': 'custom-input'}
+    assert crispy_settings.CLASS_CONVERTERS == {'textinput': 'custom-input'}
+    with pytest.raises(AttributeError):
+        crispy_settings.DEBUG
+
+
+def test_html_uses_template_cache():
+    compiled_templates.clear()
+    html = HTML('{{ foo }} and {{ foo }}')
+    html.render(None, None, Context({'foo': 'bar'}))
+    assert html.render(None, None, Context({'foo': 'baz'})) == 'baz and baz'
+    assert compiled_templates.cache_info()[:2] == (1, 1)
+
+
+def test_get_template_is_cached(settings):
+    settings.TEMPLATES = [dict(settings.TEMPLATES[0], OPTIONS={'debug': False})]
+    template = get_template('bootstrap3/field.html')
+    assert get_template('bootstrap3/field.html') is template
+
+    settings.TEMPLATES = [dict(settings.TEMPLATES[0], DIRS=[])]
+    assert get_template('bootstrap3/field.html') is not template
+
+
+def test_get_template_is_not_cached_in_debug(settings):
+    settings.TEMPLATES = [dict(settings.TEMPLATES[0], OPTIONS={'debug': True})]
+    assert get_template('bootstrap3/field.html') is not get_template('bootstrap3/field.html')
+    assert not loaded_templates
+
+
+def test_custom_field_template_is_cached(settings):
+    settings.TEMPLATES = [dict(settings.TEMPLATES[0], OPTIONS={'debug': False})]
+    form = TestForm()
+    form.helper = FormHelper(form)
+    form.helper.field_template = 'custom_field_template.html'
+
+    render_crispy_form(form)
+    assert 'custom_field_template.html' in loaded_templates[Engine.get_default()]
+
+
+@pytest.mark.skipif(django.VERSION < (1, 9), reason='requires Django 1.9')
+def test_compile_templates():
+    source = (
+        "{% load crispy_forms_field %}{% for item in items reversed %}"
+        "{% for letter in item %}{{ forloop.parentloop.counter }}{{ letter|upper }}{% empty %}-{% endfor %}"
+        "{% if forloop.last %}.{% elif item == 'b' %}<b>{% else %},{% endif %}"
+        "{% endfor %}{% with total=items|length %}{{ total }}{% endwith %}{% for x in missing %}{% empty %}!{% endfor %}"
+    )
+    context = {'items': ['ab', '', 'b', '<c>']}
+    namespace = {}
+    exec(compile_templates([('test.html', Template(source))]), namespace)
+    entry = namespace['TEMPLATES']['test.html']
+
+    template = Template(source)
+    html = template.render(Context(context))
+    assert bind_compiled(template, entry)
+    assert template.render(Context(context)) == html
+    assert not bind_compiled(Template(source + ' '), entry)
+
+
+@pytest.mark.skipif(django.VERSION < (1, 9), reason='requires Django 1.9')
+def test_compiled_templates_loader(settings, tmpdir, monkeypatch):
+    form = TestForm({'email': 'invalid'})
+    form.helper = FormHelper()
+    form.helper.layout = Layout(
+        Fieldset('legend {{ foo }}', 'is_company', 'email'),
+        MultiWidgetField('datetime_field', attrs=({'rel': 'date'}, {'rel': 'time'})),
+        HTML('{% if form.errors %}errors{% endif %}'),
+    )
+    checkboxes_form = CheckboxesTestForm()
+    html = render_crispy_form(form, context={'foo': 'bar'})
+    checkboxes_html = render_crispy_form(checkboxes_form)
+
+    call_command('compile_crispy_templates', str(tmpdir.join('crispy_compiled.py')), stdout=StringIO())
+    monkeypatch.syspath_prepend(str(tmpdir))
+    monkeypatch.delitem(sys.modules, 'crispy_compiled', raising=False)
+    settings.CRISPY_COMPILED_TEMPLATES = 'crispy_compiled'
+    options = dict(settings.TEMPLATES[0]['OPTIONS'], loaders=[
+        ('crispy_forms.template_compiler.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ])
+    settings.TEMPLATES = [dict(settings.TEMPLATES[0], APP_DIRS=False, OPTIONS=options)]
+
+    assert get_template('bootstrap3/field.html').template.crispy_compiled
+    assert not get_template('custom_field_template.html').template.crispy_compiled
+    assert render_crispy_form(form, context={'foo': 'bar'}) == html
+    assert render_crispy_form(checkboxes_form) == checkboxes_html
+
+
+@pytest.mark.skipif(sys.version_info < (3, 5), reason='requires Python 3.5')
+def test_arender_crispy_form():
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+    from crispy_forms.async_utils import arender_crispy_form
+
+    TestFormSet = formset_factory(TestForm, extra=4)
+    helper = FormHelper()
+    helper.layout = Layout(Fieldset('Item {{ forloop.counter }}', 'email'), 'password1')
+
+    loop = asyncio.new_event_loop()
+    with ThreadPoolExecutor(4) as executor:
+        html = loop.run_until_complete(arender_crispy_form(TestFormSet(), helper, executor=executor))
+        form_html = loop.run_until_complete(arender_crispy_form(TestForm(), executor=executor))
+    loop.close()
+
+    assert html == render_crispy_form(TestFormSet(), helper)
+    assert html.index('Item 1') < html.index('Item 2') < html.index('Item 3') < html.index('Item 4')
+    assert form_html == render_crispy_form(TestForm())
+
+
+@pytest.mark.skipif(sys.version_info < (3, 5), reason='requires Python 3.5')
+def test_arender_crispy_form_request_state():
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+    from crispy_forms.async_utils import arender_crispy_form
+
+    TestFormSet = formset_factory(TestForm, extra=3)
+    helper = FormHelper()
+    helper.form_action = 'simpleAction'
+    helper.layout = Layout(Fieldset(ugettext_lazy('Password'), 'password1'))
+
+    loop = asyncio.new_event_loop()
+    set_script_prefix('/prefix/')
+    try:
+        with translation.override('de'), ThreadPoolExecutor(4) as executor:
+            html = loop.run_until_complete(arender_crispy_form(TestFormSet(), helper, executor=executor))
+            assert html == render_crispy_form(TestFormSet(), helper)
+    finally:
+        set_script_prefix('/')
+        loop.close()
+
+    assert html.count('Passwort') == 3
+    assert 'action="/prefix/simple/action/"' in html
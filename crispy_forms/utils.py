@@ -1,28 +1,29 @@
 from __future__ import unicode_literals
+from copy import copy
 import logging
 import sys
 
-import django
-from django.conf import settings
+from django.core.urlresolvers import get_script_prefix, get_urlconf, set_script_prefix, set_urlconf
 from django.forms.forms import BoundField
 from django.template import Context
-from django.template.loader import get_template
+from django.utils import translation
 from django.utils.html import conditional_escape
 
 from .base import KeepContext
-from .compatibility import lru_cache, text_type, PY2, SimpleLazyObject
+from .compatibility import string_types, text_type, PY2, SimpleLazyObject
+from .conf import crispy_settings
+from .template_cache import get_template, layered_context, render_template
 
 
 def get_template_pack():
-    return getattr(settings, 'CRISPY_TEMPLATE_PACK', 'bootstrap')
+    return crispy_settings.TEMPLATE_PACK
 
 
 TEMPLATE_PACK = SimpleLazyObject(get_template_pack)
 
 
-# By caching we avoid loading the template every time render_field
-# is called without a template
-@lru_cache()
+# Templates are cached by `get_template`, so we avoid loading the template
+# every time render_field is called without a template
 def default_field_template(template_pack=TEMPLATE_PACK):
     return get_template("%s/field.html" % template_pack)
 
@@ -39,6 +40,19 @@ def set_hidden(widget):
         widget.is_hidden = True
 
 
+def copy_widget(widget):
+    """
+    Returns a copy of `widget`, and of its subwidgets if it's a `MultiWidget`, whose
+    attributes can be changed without changing `widget`. Unlike a deep copy, anything
+    else, like choices, is shared.
+    """
+    widget = copy(widget)
+    widget.attrs = widget.attrs.copy()
+    if hasattr(widget, 'widgets'):
+        widget.widgets = [copy_widget(subwidget) for subwidget in widget.widgets]
+    return widget
+
+
 def render_field(
     field, form, form_style, context, template=None, labelclass=None,
     layout_object=None, attrs=None, template_pack=TEMPLATE_PACK,
@@ -54,7 +68,7 @@ def render_field(
         to avoid double rendering fields.
     :param form: The form/formset to which that field belongs to.
     :param form_style: A way to pass style name to the CSS framework used.
-    :template: Template used for rendering the field.
+    :template: Template name, or an already loaded template, used for rendering the field.
     :layout_object: If passed, it points to the Layout object that is being rendered.
         We use it to store its bound fields in a list called `layout_object.bound_fields`
     :attrs: Attributes for the field's widget
@@ -66,7 +80,7 @@ def render_field(
         if field is None:
             return ''
 
-        FAIL_SILENTLY = getattr(settings, 'CRISPY_FAIL_SILENTLY', True)
+        FAIL_SILENTLY = crispy_settings.FAIL_SILENTLY
 
         if hasattr(field, 'render'):
             return field.render(
@@ -91,6 +105,9 @@ def render_field(
             # Injecting HTML attributes into field's widget, Django handles rendering these
             field_instance = form.fields[field]
             if attrs is not None:
+                # Changes go into a copy of the field and its widget, the form is left untouched
+                field_instance = copy(field_instance)
+                field_instance.widget = copy_widget(field_instance.widget)
                 widgets = getattr(field_instance.widget, 'widgets', [field_instance.widget])
 
                 # We use attrs as a dictionary later, so here we make a copy
@@ -138,7 +155,7 @@ def render_field(
                     template = default_field_template(template_pack)
                 else:   # FormHelper.field_template set
                     template = get_template(form.crispy_field_template)
-            else:
+            elif isinstance(template, string_types):
                 template = get_template(template)
 
             # We save the Layout object's bound fields in the layout object's `bound_fields` list
@@ -148,22 +165,73 @@ def render_field(
                 else:
                     layout_object.bound_fields = [bound_field]
 
-            context.update({
+            # A small context for the field layered over `context`, instead of a copy of it
+            field_context = {
                 'field': bound_field,
                 'labelclass': labelclass,
                 'flat_attrs': flatatt(attrs if isinstance(attrs, dict) else {}),
-            })
+            }
             if extra_context is not None:
-                context.update(extra_context)
+                field_context.update(extra_context)
 
-            if django.VERSION >= (1, 8):
-                context = context.flatten()
+            html = None
+            if crispy_settings.NATIVE_FIELD_RENDERING:
+                from crispy_forms.field_renderers import get_field_renderer
 
-            html = template.render(context)
+                renderer = get_field_renderer(template)
+                if renderer is not None:
+                    html = renderer(bound_field, layered_context(context, field_context))
+
+            if html is None:
+                html = render_template(template, context, field_context)
 
         return html
 
 
+class RenderState(object):
+    """
+    Per render state of a layout object. Attributes set on it shadow the layout object's
+    ones, any other attribute is read from the layout object. Layout objects render their
+    templates with one, instead of changing their own attributes, so that a layout can be
+    shared by requests and threads::
+
+        template.render({'input': RenderState(self, value=value)})
+    """
+    def __init__(self, layout_object, **attrs):
+        self._layout_object = layout_object
+        self.__dict__.update(attrs)
+
+    def __getattr__(self, name):
+        return getattr(self._layout_object, name)
+
+
+def carry_request_state(function):
+    """
+    Wraps `function` so that it runs with the calling thread's active language, URLconf
+    and script prefix, which Django keeps per thread. Rendering handed to another thread
+    goes through it, so that translations and reversed URLs are the same as if it had
+    been rendered in the calling thread::
+
+        executor.submit(carry_request_state(helper.render_layout), form, context)
+    """
+    language = translation.get_language()
+    urlconf = get_urlconf()
+    script_prefix = get_script_prefix()
+
+    def call_with_request_state(*args, **kwargs):
+        previous_urlconf, previous_script_prefix = get_urlconf(), get_script_prefix()
+        set_urlconf(urlconf)
+        set_script_prefix(script_prefix)
+        try:
+            with translation.override(language, deactivate=False):
+                return function(*args, **kwargs)
+        finally:
+            set_urlconf(previous_urlconf)
+            set_script_prefix(previous_script_prefix)
+
+    return call_with_request_state
+
+
 def flatatt(attrs):
     """
     Taken from django.core.utils
@@ -197,6 +265,30 @@ def render_crispy_form(form, helper=None, context=None):
     return node.render(node_context)
 
 
+def iter_crispy_form(form, helper=None, context=None):
+    """
+    Renders a form or formset like `render_crispy_form`, but returns an iterator over
+    chunks of its HTML output. Layouts are rendered as the iterator is consumed, one top
+    level field or layout object at a time, so it can feed a `StreamingHttpResponse`::
+
+        return StreamingHttpResponse(iter_crispy_form(formset, helper))
+    """
+    from crispy_forms.templatetags.crispy_forms_tags import CrispyFormNode
+
+    if helper is not None:
+        node = CrispyFormNode('form', 'helper')
+    else:
+        node = CrispyFormNode('form', None)
+
+    node_context = Context(context)
+    node_context.update({
+        'form': form,
+        'helper': helper
+    })
+
+    return node.iter_render(node_context)
+
+
 def list_intersection(list1, list2):
     """
     Take the not-in-place intersection of two lists, similar to sets but preserving order.